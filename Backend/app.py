@@ -1,130 +1,165 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import json
 import os
-import uuid
+import logging
 import sys
+from city_context import DEFAULT_LIMIT
+from http_utils import wants_stream, event_stream_response
+from compression import init_compression
+from metrics import init_metrics, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from static_files import StaticIndex, send_static
+from log_config import configure_logging, init_request_ids, SAMPLED
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Test imports one by one to identify issues
-print("🔍 Testing imports...")
+logger.debug("🔍 Testing imports...")
 
 try:
-    print("📊 Testing visualizations import...")
-    from visualizations import QlooVisualizer
-    print("✅ QlooVisualizer imported successfully")
+    logger.debug("📊 Testing visualizations import...")
+    from visualizations import (
+        QlooVisualizer, VisualizationsGet, splice_visualizations_json, select_charts, entity_types_for
+    )
+    logger.debug("✅ QlooVisualizer imported successfully")
 except Exception as e:
-    print(f"❌ Failed to import QlooVisualizer: {e}")
+    logger.error("❌ Failed to import QlooVisualizer: %s", e)
     sys.exit(1)
 
 try:
-    print("🤖 Testing chatgpt_analysis import...")
-    from chatgpt_analysis import analyze_business_environment, get_chat_response
-    print("✅ chatgpt_analysis imported successfully")
+    logger.debug("🤖 Testing chatgpt_analysis import...")
+    from chatgpt_analysis import analyze_business_environment, get_chat_response, stream_business_analysis, stream_chat_response
+    logger.debug("✅ chatgpt_analysis imported successfully")
 except Exception as e:
-    print(f"❌ Failed to import chatgpt_analysis: {e}")
+    logger.error("❌ Failed to import chatgpt_analysis: %s", e)
     sys.exit(1)
 
-print("✅ All imports successful!")
+logger.info("✅ All imports successful!")
 
-app = Flask(__name__, static_folder='static', static_url_path='')
+app = Flask(__name__, static_folder=None)
 CORS(app, origins=["*"])  # Enable CORS for all origins in production
+# A fresh request_id for every request, set before the other hooks log
+init_request_ids(app)
+# Before compression, so the timing includes it
+init_metrics(app)
+init_compression(app)
+static_index = StaticIndex()
 
 @app.route('/api/visualizations', methods=['POST'])
 def generate_visualizations():
-    # Generate unique request ID for tracking
-    request_id = str(uuid.uuid4())[:8]
-    
     try:
         data = request.get_json()
         city = data.get('city')
         country = data.get('country')
-        limit = data.get('limit', 20)
-        print(f"[{request_id}] 🔍 NEW REQUEST - City: {city}, Country: {country}, Limit: {limit}")
+        limit = data.get('limit', DEFAULT_LIMIT)
+        logger.info("🔍 NEW REQUEST - City: %s, Country: %s, Limit: %s", city, country, limit)
+        
+        # Optional subset of charts; only the entity types they read are fetched
+        try:
+            charts = select_charts(data.get('charts'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        entity_types = entity_types_for(charts)
         
         # Create a FRESH instance for each request to prevent caching issues
         visualizer = QlooVisualizer()
-        print(f"[{request_id}] ✅ Created fresh QlooVisualizer instance")
         
-        # Fetch Qloo API data ONCE
-        print(f"[{request_id}] 📡 Fetching brands data for {city}, {country}...")
-        from qloo_analysis import get_brands
-        raw_brands = get_brands(city, country, limit)
+        # Fetch Qloo API data ONCE per city, brands and places concurrently
+        logger.debug("📡 Fetching %s data for %s, %s...", ' and '.join(sorted(entity_types)), city, country, extra=SAMPLED)
+        from city_context import get_city_context
+        raw_brands, raw_places = get_city_context(city, country).get_entities(
+            limit, brands='brands' in entity_types, places='places' in entity_types
+        )
         
         # Debug: Check brands data content
         if raw_brands and 'results' in raw_brands and 'entities' in raw_brands['results']:
             brand_names = [brand.get('name', 'Unknown') for brand in raw_brands['results']['entities'][:3]]
-            print(f"[{request_id}] 📊 Brands data received: {len(raw_brands['results']['entities'])} brands")
-            print(f"[{request_id}] 📊 First 3 brands: {brand_names}")
-        else:
-            print(f"[{request_id}] ⚠️ No valid brands data received")
-        
-        print(f"[{request_id}] 📡 Fetching places data for {city}, {country}...")
-        from qloo_analysis import get_places
-        raw_places = get_places(city, country, limit)
+            logger.debug("📊 Brands data received: %s brands", len(raw_brands['results']['entities']), extra=SAMPLED)
+            logger.debug("📊 First 3 brands: %s", brand_names, extra=SAMPLED)
+        elif 'brands' in entity_types:
+            logger.warning("⚠️ No valid brands data received")
         
         # Debug: Check places data content
         if raw_places and 'results' in raw_places and 'entities' in raw_places['results']:
             place_names = [place.get('name', 'Unknown') for place in raw_places['results']['entities'][:3]]
-            print(f"[{request_id}] 🏢 Places data received: {len(raw_places['results']['entities'])} places")
-            print(f"[{request_id}] 🏢 First 3 places: {place_names}")
-        else:
-            print(f"[{request_id}] ⚠️ No valid places data received")
+            logger.debug("🏢 Places data received: %s places", len(raw_places['results']['entities']), extra=SAMPLED)
+            logger.debug("🏢 First 3 places: %s", place_names, extra=SAMPLED)
+        elif 'places' in entity_types:
+            logger.warning("⚠️ No valid places data received")
         
         # Set the pre-fetched data in the visualizer
-        print(f"[{request_id}] 🔄 Setting data in visualizer...")
+        logger.debug("🔄 Setting data in visualizer...", extra=SAMPLED)
         visualizer.set_data(raw_brands, raw_places)
         
         # Now generate all visualizations using the pre-fetched data
-        print(f"[{request_id}] 🎨 Generating visualizations...")
-        viz_data = visualizer.generate_all_visualizations(city, country, limit)
-        print(f"[{request_id}] ✅ Generated visualizations for {city}, {country}")
+        logger.debug("🎨 Generating visualizations...", extra=SAMPLED)
+        viz_data = visualizer.generate_all_visualizations(city, country, limit, compact=bool(data.get('compact')), charts=charts)
+        logger.debug("✅ Generated visualizations for %s, %s", city, country, extra=SAMPLED)
         
         # Debug: Check what visualizations were generated
         viz_keys = list(viz_data.keys()) if viz_data else []
-        print(f"[{request_id}] 📈 Generated visualizations: {viz_keys}")
+        logger.info("📈 Generated visualizations: %s", viz_keys)
         
+        # "version": 2 nests the figures as objects; version 1 keeps them as JSON strings
+        if data.get('version') == 2:
+            return Response(splice_visualizations_json(viz_data), mimetype='application/json')
         return jsonify(viz_data)
     except Exception as e:
-        print(f"[{request_id}] ❌ Exception: {e}")
+        logger.exception("❌ Exception: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/visualizations', methods=['GET'])
+def get_visualizations():
+    """Cacheable GET form of the endpoint: same response, plus an ETag and 304s for revisits"""
+    try:
+        try:
+            view = VisualizationsGet(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        raw_brands, raw_places = view.context.get_entities(view.limit, **view.fetch)
+        status, body, headers = view.response(request, raw_brands, raw_places)
+        return Response(body, status=status, headers=headers, mimetype='application/json')
+    except Exception as e:
+        logger.exception("❌ Exception: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/chatgpt-analysis', methods=['POST'])
 def chatgpt_analysis():
     """Generate ChatGPT analysis of business environment"""
-    request_id = str(uuid.uuid4())[:8]
-    
     try:
         data = request.get_json()
         city = data.get('city')
         country = data.get('country')
-        limit = data.get('limit', 30)
+        limit = data.get('limit', DEFAULT_LIMIT)
+        
+        logger.info("🤖 ChatGPT Analysis Request - City: %s, Country: %s, Limit: %s", city, country, limit)
         
-        print(f"[{request_id}] 🤖 ChatGPT Analysis Request - City: {city}, Country: {country}, Limit: {limit}")
+        # Streaming clients get the analysis token by token; others keep the JSON response
+        if wants_stream(data):
+            logger.info("📶 Streaming analysis response")
+            return event_stream_response(stream_business_analysis(city, country, limit))
         
         # Generate business environment analysis
-        print(f"[{request_id}] 🔄 Calling analyze_business_environment...")
+        logger.debug("🔄 Calling analyze_business_environment...", extra=SAMPLED)
         result = analyze_business_environment(city, country, limit)
         
-        print(f"[{request_id}] 📊 Analysis result: {result}")
+        logger.debug("📊 Analysis result fields: %s", list(result), extra=SAMPLED)
         
         if result.get("error"):
-            print(f"[{request_id}] ❌ ChatGPT Analysis Error: {result['error']}")
+            logger.error("❌ ChatGPT Analysis Error: %s", result['error'])
             return jsonify({'error': result['error']}), 500
         
-        print(f"[{request_id}] ✅ ChatGPT Analysis completed successfully")
+        logger.info("✅ ChatGPT Analysis completed successfully")
         return jsonify(result)
         
     except Exception as e:
-        print(f"[{request_id}] 💥 ChatGPT Analysis Exception: {e}")
-        import traceback
-        print(f"[{request_id}] 💥 Full traceback: {traceback.format_exc()}")
+        logger.exception("💥 ChatGPT Analysis Exception: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/chat-response', methods=['POST'])
 def chat_response():
     """Get chat response from ChatGPT about business environment"""
-    request_id = str(uuid.uuid4())[:8]
-    
     try:
         data = request.get_json()
         city = data.get('city')
@@ -134,26 +169,35 @@ def chat_response():
         if not message:
             return jsonify({'error': 'Message is required'}), 400
         
-        print(f"[{request_id}] 💬 Chat Request - City: {city}, Country: {country}, Message: {message[:50]}...")
+        logger.info("💬 Chat Request - City: %s, Country: %s, Message: %s...", city, country, message[:50])
+        
+        if wants_stream(data):
+            logger.info("📶 Streaming chat response")
+            return event_stream_response(stream_chat_response(message, city, country))
         
         # Get chat response
         result = get_chat_response(message, city, country)
         
         if result.get("error"):
-            print(f"[{request_id}] ❌ Chat Response Error: {result['error']}")
+            logger.error("❌ Chat Response Error: %s", result['error'])
             return jsonify({'error': result['error']}), 500
         
-        print(f"[{request_id}] ✅ Chat Response generated successfully")
+        logger.info("✅ Chat Response generated successfully")
         return jsonify(result)
         
     except Exception as e:
-        print(f"[{request_id}] ❌ Chat Response Exception: {e}")
+        logger.exception("❌ Chat Response Exception: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'service': 'Palatlas API'})
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text: request, upstream and chart timings, cache hit rates and upstream errors for this worker"""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/api', methods=['GET'])
 def api_root():
     return jsonify({
@@ -161,6 +205,7 @@ def api_root():
         'version': '1.0.0',
         'endpoints': [
             '/api/health',
+            '/api/metrics',
             '/api/visualizations',
             '/api/chatgpt-analysis',
             '/api/chat-response'
@@ -171,41 +216,28 @@ def api_root():
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    if path != "" and os.path.exists(app.static_folder + '/' + path):
-        return send_from_directory(app.static_folder, path)
-    else:
-        return send_from_directory(app.static_folder, 'index.html')
+    return send_static(static_index, path)
 
 if __name__ == '__main__':
     try:
         # Get port from environment variable or default to 5000
         port = int(os.environ.get('PORT', 5000))
-        print(f"🚀 Starting Palatlas Flask app on port {port}")
-        print(f"🌐 Binding to 0.0.0.0:{port}")
-        print(f"📁 Static folder: {app.static_folder}")
-        print(f"🔧 Debug mode: {app.debug}")
-        print(f"🏥 Health check endpoint: /api/health")
-        
-        # Check if static folder exists
-        if not os.path.exists(app.static_folder):
-            print(f"⚠️ Warning: Static folder {app.static_folder} does not exist!")
-        else:
-            print(f"✅ Static folder {app.static_folder} exists")
-            static_files = os.listdir(app.static_folder)
-            print(f"📄 Static files: {static_files[:5]}...")  # Show first 5 files
+        logger.info("🚀 Starting Palatlas Flask app on port %s", port)
+        logger.info("🌐 Binding to 0.0.0.0:%s", port)
+        logger.info("📁 Static folder: %s (%s files)", static_index.root, len(static_index))
+        logger.info("🔧 Debug mode: %s", app.debug)
+        logger.info("🏥 Health check endpoint: /api/health")
         
         # Check environment variables
-        print(f"🔑 Environment check:")
-        print(f"   QLOO_API_KEY: {'✅ Set' if os.environ.get('QLOO_API_KEY') else '❌ Missing'}")
-        print(f"   OPENAI_API_KEY: {'✅ Set' if os.environ.get('OPENAI_API_KEY') else '❌ Missing'}")
-        print(f"   MAPBOX_ACCESS_TOKEN: {'✅ Set' if os.environ.get('MAPBOX_ACCESS_TOKEN') else '❌ Missing'}")
+        logger.info("🔑 Environment check:")
+        logger.info("   QLOO_API_KEY: %s", '✅ Set' if os.environ.get('QLOO_API_KEY') else '❌ Missing')
+        logger.info("   OPENAI_API_KEY: %s", '✅ Set' if os.environ.get('OPENAI_API_KEY') else '❌ Missing')
+        logger.info("   MAPBOX_ACCESS_TOKEN: %s", '✅ Set' if os.environ.get('MAPBOX_ACCESS_TOKEN') else '❌ Missing')
         
         # Use 0.0.0.0 to bind to all available network interfaces
-        print(f"🌐 Starting Flask server...")
+        logger.info("🌐 Starting Flask server...")
         app.run(host='0.0.0.0', port=port, debug=False)
         
     except Exception as e:
-        print(f"❌ Failed to start Flask app: {e}")
-        import traceback
-        print(f"💥 Full traceback: {traceback.format_exc()}")
+        logger.exception("❌ Failed to start Flask app: %s", e)
         sys.exit(1) 
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+Async (ASGI) variant of the Palatlas API.
+
+Serves the same JSON endpoints as app.py, but Qloo and OpenAI calls are
+awaited on one event loop instead of holding a thread per request, so a
+single process can keep thousands of upstream waits in flight. Chart
+building is CPU-bound and runs on the default thread pool.
+
+Run with:
+    hypercorn asgi_app:app --bind 0.0.0.0:$PORT --workers $WEB_CONCURRENCY
+"""
+import asyncio
+import logging
+import os
+
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+
+from city_context import DEFAULT_LIMIT, get_city_context
+from chatgpt_analysis import async_analyze_business_environment, async_get_chat_response
+from compression import init_async_compression
+from metrics import init_async_metrics, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from static_files import StaticIndex, async_send_static
+from log_config import configure_logging, init_async_request_ids
+from qloo_analysis import async_close
+from visualizations import (
+    QlooVisualizer, VisualizationsGet, splice_visualizations_json, select_charts, entity_types_for
+)
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+app = Quart(__name__, static_folder=None)
+app = cors(app, allow_origin="*")
+# A fresh request_id for every request, set before the other hooks log
+init_async_request_ids(app)
+# Before compression, so the timing includes it
+init_async_metrics(app)
+init_async_compression(app)
+static_index = StaticIndex()
+
+
+def _render_visualizations(raw_brands, raw_places, city, country, limit, compact=False, charts=None):
+    """Build the selected charts for pre-fetched data (runs in a worker thread)"""
+    visualizer = QlooVisualizer()
+    visualizer.set_data(raw_brands, raw_places)
+    return visualizer.generate_all_visualizations(city, country, limit, compact=compact, charts=charts)
+
+
+@app.route('/api/visualizations', methods=['POST'])
+async def generate_visualizations():
+    try:
+        data = await request.get_json()
+        city = data.get('city')
+        country = data.get('country')
+        limit = data.get('limit', DEFAULT_LIMIT)
+        logger.info("🔍 NEW ASYNC REQUEST - City: %s, Country: %s, Limit: %s", city, country, limit)
+
+        # Optional subset of charts; only the entity types they read are fetched
+        try:
+            charts = select_charts(data.get('charts'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        entity_types = entity_types_for(charts)
+
+        raw_brands, raw_places = await get_city_context(city, country).async_get_entities(
+            limit, brands='brands' in entity_types, places='places' in entity_types
+        )
+
+        viz_data = await asyncio.to_thread(
+            _render_visualizations, raw_brands, raw_places, city, country, limit, bool(data.get('compact')), charts
+        )
+        logger.info("✅ Generated visualizations for %s, %s: %s", city, country, list(viz_data.keys()))
+
+        # "version": 2 nests the figures as objects; version 1 keeps them as JSON strings
+        if data.get('version') == 2:
+            return Response(splice_visualizations_json(viz_data), mimetype='application/json')
+        return jsonify(viz_data)
+    except Exception as e:
+        logger.exception("❌ Exception: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/visualizations', methods=['GET'])
+async def get_visualizations():
+    """Cacheable GET form of the endpoint: same response, plus an ETag and 304s for revisits"""
+    try:
+        try:
+            view = VisualizationsGet(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        raw_brands, raw_places = await view.context.async_get_entities(view.limit, **view.fetch)
+        status, body, headers = await asyncio.to_thread(view.response, request, raw_brands, raw_places)
+        return Response(body, status=status, headers=headers, mimetype='application/json')
+    except Exception as e:
+        logger.exception("❌ Exception: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/chatgpt-analysis', methods=['POST'])
+async def chatgpt_analysis():
+    """Generate ChatGPT analysis of business environment"""
+    try:
+        data = await request.get_json()
+        city = data.get('city')
+        country = data.get('country')
+        limit = data.get('limit', DEFAULT_LIMIT)
+        logger.info("🤖 Async ChatGPT Analysis Request - City: %s, Country: %s, Limit: %s", city, country, limit)
+
+        result = await async_analyze_business_environment(city, country, limit)
+
+        if result.get("error"):
+            logger.error("❌ ChatGPT Analysis Error: %s", result['error'])
+            return jsonify({'error': result['error']}), 500
+
+        return jsonify(result)
+    except Exception as e:
+        logger.exception("💥 ChatGPT Analysis Exception: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/chat-response', methods=['POST'])
+async def chat_response():
+    """Get chat response from ChatGPT about business environment"""
+    try:
+        data = await request.get_json()
+        city = data.get('city')
+        country = data.get('country')
+        message = data.get('message')
+
+        if not message:
+            return jsonify({'error': 'Message is required'}), 400
+
+        logger.info("💬 Async Chat Request - City: %s, Country: %s, Message: %s...", city, country, message[:50])
+
+        result = await async_get_chat_response(message, city, country)
+
+        if result.get("error"):
+            logger.error("❌ Chat Response Error: %s", result['error'])
+            return jsonify({'error': result['error']}), 500
+
+        return jsonify(result)
+    except Exception as e:
+        logger.exception("❌ Chat Response Exception: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/health', methods=['GET'])
+async def health_check():
+    return jsonify({'status': 'healthy', 'service': 'Palatlas API (async)'})
+
+
+@app.route('/api/metrics', methods=['GET'])
+async def metrics_endpoint():
+    """Prometheus text: request, upstream and chart timings, cache hit rates and upstream errors for this worker"""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/api', methods=['GET'])
+async def api_root():
+    return jsonify({
+        'message': 'Palatlas API is running (async)',
+        'version': '1.0.0',
+        'endpoints': [
+            '/api/health',
+            '/api/metrics',
+            '/api/visualizations',
+            '/api/chatgpt-analysis',
+            '/api/chat-response'
+        ]
+    })
+
+
+# Serve React app for all other routes
+@app.route('/', defaults={'path': ''})
+@app.route('/<path:path>')
+async def serve(path):
+    return await async_send_static(static_index, path)
+
+
+@app.after_serving
+async def close_upstream_clients():
+    await async_close()
+
+
+if __name__ == '__main__':
+    from hypercorn.asyncio import serve as hypercorn_serve
+    from hypercorn.config import Config
+
+    port = int(os.environ.get('PORT', 5000))
+    config = Config()
+    config.bind = [f"0.0.0.0:{port}"]
+    logger.info("🚀 Starting async Palatlas app on port %s", port)
+    asyncio.run(hypercorn_serve(app, config))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of business-type classification for the chart builders.
+
+Compares the old per-place keyword scan (rebuilding ' '.join(tag_names) for
+every keyword, as the hours, price and seasonal charts each did) against the
+precompiled tag classifier in city_dataset.py, at 1k and 10k entities. The
+classifier timing includes building the whole EntityTable, since that is
+the single pass the classes are computed in.
+
+Usage (from the Backend directory):
+    python bench_classifier.py
+"""
+import random
+import time
+
+from city_dataset import EntityTable, classify_tag, DINING, FOOD, RETAIL, OFFICE, HOTEL, OUTDOOR, LUXURY
+
+TAGS = [
+    'Restaurant', 'Cafe', 'Bar', 'Fast Food', 'Shop', 'Retail Store', 'Office', 'Professional Services',
+    'Hotel', 'Accommodation', 'Park', 'Beach', 'Outdoor Seating', 'Luxury', 'High-End Boutique',
+    'Museum', 'Bakery', 'Gym', 'Library', 'Theatre',
+]
+
+# The keyword lists the three charts scanned, in the order they scanned them
+KEYWORD_CHECKS = [
+    ['restaurant', 'cafe', 'bar', 'food'], ['shop', 'store', 'retail'], ['office', 'business', 'professional'],
+    ['luxury', 'premium', 'high-end'], ['restaurant', 'cafe', 'bar'], ['shop', 'store', 'retail'],
+    ['restaurant', 'cafe', 'bar'], ['hotel', 'accommodation'], ['outdoor', 'park', 'beach'],
+]
+CLASS_CHECKS = [DINING | FOOD, RETAIL, OFFICE, LUXURY, DINING, RETAIL, DINING, HOTEL, OUTDOOR]
+
+
+def make_places(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {'name': f'place-{i}', 'tags': [{'name': t} for t in rng.sample(TAGS, rng.randint(0, 5))]}
+        for i in range(n)
+    ]
+
+
+def scan_keywords(places):
+    results = []
+    for place in places:
+        tag_names = [tag.get('name', '').lower() for tag in place.get('tags', [])]
+        results.append([any(word in ' '.join(tag_names) for word in words) for words in KEYWORD_CHECKS])
+    return results
+
+
+def classify(places):
+    table = EntityTable(places)
+    return [table.has_class(flags) for flags in CLASS_CHECKS]
+
+
+def best_of(fn, *args, runs=5):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print("⏱️  Business-type classification (best of 5)\n")
+    print(f"{'entities':>9} {'keyword scan ms':>16} {'classifier ms':>14} {'speedup':>8}")
+    for n in (1_000, 10_000):
+        places = make_places(n)
+
+        # Both approaches must agree before their timings mean anything
+        expected = scan_keywords(places)
+        masks = classify(places)
+        assert all(expected[i][c] == bool(masks[c][i]) for i in range(n) for c in range(len(CLASS_CHECKS)))
+
+        classify_tag.cache_clear()
+        scan = best_of(scan_keywords, places)
+        classified = best_of(classify, places)
+        print(f"{n:>9} {scan * 1000:>16.1f} {classified * 1000:>14.1f} {scan / classified:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
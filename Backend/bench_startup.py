@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold-start import time and memory of the backend modules.
+
+Each measurement runs in a fresh interpreter so nothing is shared between
+runs. The "eager" row imports the full plotting stack the way
+visualizations.py used to (matplotlib, seaborn, plotly.express, ...) to
+show what startup cost before the imports were made lazy.
+
+Usage (from the Backend directory):
+    python bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+EAGER_PLOTTING = (
+    "import matplotlib.pyplot as plt; import seaborn as sns; "
+    "import plotly.express as px; import plotly.graph_objects as go; "
+    "import pandas as pd; import numpy as np; plt.style.use('seaborn-v0_8')"
+)
+
+CASES = [
+    ("eager plotting stack (old visualizations.py)", EAGER_PLOTTING),
+    ("import visualizations", "import visualizations"),
+    ("import app", "import app"),
+    ("import hybrid_app", "import hybrid_app"),
+    ("import app + first chart", "import app, visualizations; "
+     "brands = {'results': {'entities': [{'name': f'Brand {i}', 'popularity': i / 20} for i in range(20)]}}; "
+     "v = visualizations.QlooVisualizer(); v.set_data(brands, None); "
+     "v.create_brand_popularity_chart('Paris', 'FR', 20).to_json()"),
+]
+
+# Runs inside the child interpreter: times the statement and reports peak RSS
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+exec(sys.argv[1])
+elapsed = time.perf_counter() - start
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({"seconds": elapsed, "rss_mb": rss_mb}))
+"""
+
+
+def measure(statement):
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, statement],
+        capture_output=True, text=True, env={**os.environ, "QLOO_CACHE_DIR": ""}
+    )
+    if result.returncode != 0:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"⏱️  Cold-start benchmark ({args.runs} runs each, fresh interpreter per run)\n")
+    print(f"{'case':<48} {'median s':>9} {'min s':>8} {'max RSS MB':>11}")
+    for label, statement in CASES:
+        samples = [measure(statement) for _ in range(args.runs)]
+        samples = [s for s in samples if s]
+        if not samples:
+            print(f"{label:<48} {'unavailable (missing dependency)':>30}")
+            continue
+        times = [s["seconds"] for s in samples]
+        rss = max(s["rss_mb"] for s in samples)
+        print(f"{label:<48} {statistics.median(times):>9.3f} {min(times):>8.3f} {rss:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache with a byte budget and per-entry TTL.
+
+    Callers pass the size of each value when storing it (usually the length of
+    the raw response body); least recently used entries are evicted once the
+    total exceeds max_bytes. Values are returned as stored, so callers must
+    treat them as read-only.
+    """
+
+    def __init__(self, max_bytes, ttl, name="cache"):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._bytes -= size
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size, ttl=None):
+        """Store value under key; values larger than the whole budget are skipped."""
+        if self.max_bytes <= 0 or size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Persistent cache tier stored in a local SQLite database.
+
+    Values are JSON-encoded and zlib-compressed, with an absolute expiry
+    timestamp per row. The database runs in WAL mode so several worker
+    processes can read and write it concurrently; each thread (and each
+    forked process) opens its own connection. Storage errors are counted and
+    reported as misses so the cache can never fail a request.
+    """
+
+    PURGE_EVERY = 256
+
+    def __init__(self, path, ttl, name="disk"):
+        self.name = name
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload BLOB NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_entry(self, key):
+        """Return (value, size, ttl_remaining) for key, or None if missing or expired."""
+        now = time.time()
+        try:
+            row = self._connect().execute(
+                "SELECT expires_at, payload FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] <= now:
+                self._count("misses")
+                return None
+            raw = zlib.decompress(row[1])
+            value = json.loads(raw)
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            logger.warning("⚠️ %s read failed: %s", self.name, e)
+            self._count("errors")
+            self._count("misses")
+            return None
+        self._count("hits")
+        return value, len(raw), row[0] - now
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None):
+        """Compress and store value under key, purging expired rows now and then."""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        try:
+            payload = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, expires_at, payload) VALUES (?, ?, ?)",
+                (key, expires_at, payload),
+            )
+            with self._lock:
+                self._writes += 1
+                purge = self._writes % self.PURGE_EVERY == 0
+            if purge:
+                conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning("⚠️ %s write failed: %s", self.name, e)
+            self._count("errors")
+
+    def stats(self):
+        """Return hit/miss counters and the number of stored rows."""
+        try:
+            entries = self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "path": self.path,
+                "entries": entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait on the same future and receive its result (or exception).
+    """
+
+    def __init__(self, name="singleflight"):
+        self.name = name
+        self._calls = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+            }
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight for use inside one event loop.
+
+    Waiters are shielded, so a cancelled request does not cancel the shared
+    fetch the other callers are waiting on.
+    """
+
+    def __init__(self, name="async_singleflight"):
+        self.name = name
+        self._calls = {}  # key -> asyncio.Task
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
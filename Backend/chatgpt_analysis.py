@@ -1,88 +1,281 @@
 import json
+import logging
 import os
-from openai import OpenAI
-from qloo_analysis import get_brands, get_places
+import hashlib
+import threading
+from cache import TTLCache
+from city_context import DEFAULT_LIMIT, get_city_context
+from log_config import SAMPLED
+import metrics
+
+logger = logging.getLogger(__name__)
 
 # Set up OpenAI client
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-4o-mini')
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# Clients are created on first use: the OpenAI SDK takes ~0.5s to import, which
+# routes that never call the model (visualizations, health) should not pay
+client = None
+async_client = None
+
+def get_client():
+    """Return the shared OpenAI client, creating it on first use"""
+    global client
+    if client is None and OPENAI_API_KEY:
+        from openai import OpenAI
+        client = OpenAI(api_key=OPENAI_API_KEY)
+    return client
+
+def get_async_client():
+    """Return the shared AsyncOpenAI client, creating it on first use"""
+    global async_client
+    if async_client is None and OPENAI_API_KEY:
+        from openai import AsyncOpenAI
+        async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return async_client
+
+# Bump whenever create_analysis_prompt changes so memoized analyses from the old prompt are not reused
+PROMPT_VERSION = "1"
+
+# Memoized analyses keyed by analysis_fingerprint(); identical inputs skip the LLM call entirely
+ANALYSIS_CACHE_TTL = float(os.environ.get('ANALYSIS_CACHE_TTL', '3600'))
+ANALYSIS_CACHE_MAX_BYTES = int(os.environ.get('ANALYSIS_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+analysis_cache = TTLCache(ANALYSIS_CACHE_MAX_BYTES, ANALYSIS_CACHE_TTL, name="analysis_memo")
+metrics.register_cache(analysis_cache)
+
+_token_stats = {"tokens_spent": 0, "tokens_saved": 0}
+_token_stats_lock = threading.Lock()
+
+def analysis_fingerprint(data_summary, model=OPENAI_MODEL):
+    """Content hash of the prepared data summary, model name and prompt template version"""
+    payload = json.dumps(
+        {"summary": data_summary, "model": model, "prompt_version": PROMPT_VERSION},
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
-def analyze_business_environment(city_name, country_code, limit=50):
+def _response_tokens(response):
+    """Total tokens billed for a Responses API call, or 0 if usage is unavailable"""
+    usage = getattr(response, 'usage', None)
+    return getattr(usage, 'total_tokens', 0) or 0
+
+def _record_tokens(counter, tokens):
+    with _token_stats_lock:
+        _token_stats[counter] += tokens
+    metrics.LLM_TOKENS.inc(tokens, kind=counter.split('_')[1])
+
+def analysis_cache_stats():
+    """Hit/miss counters for memoized analyses plus tokens spent and saved"""
+    stats = analysis_cache.stats()
+    with _token_stats_lock:
+        stats.update(_token_stats)
+    return stats
+
+def analyze_business_environment(city_name, country_code, limit=DEFAULT_LIMIT):
     """
     Analyze the business environment of a place using ChatGPT based on Qloo data
     """
+    return _final_event(_analysis_events(city_name, country_code, limit, stream=False))
+
+def stream_business_analysis(city_name, country_code, limit=DEFAULT_LIMIT):
+    """
+    Streaming variant of analyze_business_environment.
+
+    Yields (event, payload) tuples: ("delta", {"text": ...}) for each chunk of
+    analysis text as the model produces it, then a single ("done", result)
+    carrying the same dict analyze_business_environment returns, or
+    ("error", {"error": ...}) on failure.
+    """
+    return _analysis_events(city_name, country_code, limit, stream=True)
+
+def _final_event(events):
+    """Drain an event stream and return the payload of its done/error event"""
+    for event, payload in events:
+        if event in ("done", "error"):
+            return payload
+    return {"error": "No result produced", "analysis": None}
+
+def _create_response(operation, prompt):
+    """Non-streaming Responses API call, timed as an upstream call"""
+    with metrics.upstream_call('openai', operation):
+        return get_client().responses.create(model=OPENAI_MODEL, input=prompt)
+
+async def _async_create_response(operation, prompt):
+    """Async version of _create_response"""
+    with metrics.upstream_call('openai', operation):
+        return await get_async_client().responses.create(model=OPENAI_MODEL, input=prompt)
+
+def _stream_deltas(operation, prompt):
+    """
+    Call the Responses API in streaming mode, yielding delta events; returns (text, tokens)
+
+    The recorded time runs until the stream completes, so it includes the
+    time spent handing each delta to the client.
+    """
+    chunks = []
+    tokens = 0
+    with metrics.upstream_call('openai', f'{operation}_stream'):
+        for event in get_client().responses.create(model=OPENAI_MODEL, input=prompt, stream=True):
+            if event.type == "response.output_text.delta":
+                chunks.append(event.delta)
+                yield "delta", {"text": event.delta}
+            elif event.type == "response.completed":
+                tokens = _response_tokens(event.response)
+    return "".join(chunks), tokens
+
+def _analysis_events(city_name, country_code, limit, stream):
     try:
-        print(f"[ChatGPT Analysis] 🚀 Starting analysis for {city_name}, {country_code}")
+        logger.info("🚀 Starting analysis for %s, %s", city_name, country_code)
         # Validate API key
         if not OPENAI_API_KEY:
             err = "Missing OPENAI_API_KEY in environment. Set it and restart the server."
-            print(f"[ChatGPT Analysis] ❌ {err}")
-            return {"error": err, "analysis": None}
+            logger.error("❌ %s", err)
+            yield "error", {"error": err, "analysis": None}
+            return
         
-        # Fetch data from Qloo
-        print(f"[ChatGPT Analysis] 📡 Fetching brands data...")
-        brands_data = get_brands(city_name, country_code, limit)
+        # Reuse the analysis already generated for this city, if any
+        context = get_city_context(city_name, country_code)
+        existing = context.get_analysis(limit)
+        if existing is not None:
+            logger.info("♻️ Reusing stored analysis for %s, %s", city_name, country_code)
+            yield "delta", {"text": existing["analysis"]}
+            yield "done", existing
+            return
         
-        print(f"[ChatGPT Analysis] 📡 Fetching places data...")
-        places_data = get_places(city_name, country_code, limit)
+        # Fetch data from Qloo (shared with the visualization endpoint through the city context)
+        logger.debug("📡 Fetching brands and places data...", extra=SAMPLED)
+        brands_data, places_data = context.get_entities(limit)
         
         if not brands_data or not places_data:
-            print(f"[ChatGPT Analysis] ❌ Failed to fetch data from Qloo API")
-            return {
+            logger.error("❌ Failed to fetch data from Qloo API")
+            yield "error", {
                 "error": "Failed to fetch data from Qloo API",
                 "analysis": None
             }
+            return
         
-        print(f"[ChatGPT Analysis] ✅ Qloo data fetched successfully")
-        
-        # Extract key information from the data
-        brands = brands_data.get('results', {}).get('entities', [])
-        places = places_data.get('results', {}).get('entities', [])
+        brands, places, prompt, fingerprint = _prepare_analysis(brands_data, places_data, city_name, country_code)
         
-        print(f"[ChatGPT Analysis] 📊 Found {len(brands)} brands and {len(places)} places")
+        # Identical summaries (same model and prompt version) reuse the memoized analysis
+        analysis = _memoized_analysis(fingerprint)
+        if analysis is not None:
+            yield "delta", {"text": analysis}
+        elif stream:
+            logger.info("🤖 Streaming request to ChatGPT...")
+            analysis, tokens = yield from _stream_deltas('analysis', prompt)
+            _memoize_analysis(fingerprint, analysis, tokens)
+        else:
+            logger.info("🤖 Sending request to ChatGPT...")
+            
+            # Call ChatGPT using the latest API structure
+            response = _create_response('analysis', prompt)
+            
+            analysis = response.output_text
+            _memoize_analysis(fingerprint, analysis, _response_tokens(response))
         
-        # Prepare data summary for ChatGPT
-        print(f"[ChatGPT Analysis] 🔄 Preparing data summary...")
-        data_summary = prepare_data_summary(brands, places, city_name, country_code)
+        result = _analysis_result(analysis, brands, places, city_name, country_code)
+        context.set_analysis(limit, result)
+        yield "done", result
         
-        # Create prompt for ChatGPT
-        print(f"[ChatGPT Analysis] 📝 Creating analysis prompt...")
-        prompt = create_analysis_prompt(data_summary, city_name, country_code)
+    except Exception as e:
+        logger.exception("💥 Analysis failed: %s: %s", type(e).__name__, e)
+        yield "error", {
+            "error": f"Analysis failed: {str(e)}",
+            "analysis": None
+        }
+
+async def async_analyze_business_environment(city_name, country_code, limit=DEFAULT_LIMIT):
+    """
+    Async version of analyze_business_environment for the ASGI app
+    """
+    try:
+        logger.info("🚀 Starting async analysis for %s, %s", city_name, country_code)
+        if not OPENAI_API_KEY:
+            err = "Missing OPENAI_API_KEY in environment. Set it and restart the server."
+            logger.error("❌ %s", err)
+            return {"error": err, "analysis": None}
         
-        print(f"[ChatGPT Analysis] 🤖 Sending request to ChatGPT...")
+        context = get_city_context(city_name, country_code)
+        existing = context.get_analysis(limit)
+        if existing is not None:
+            logger.info("♻️ Reusing stored analysis for %s, %s", city_name, country_code)
+            return existing
         
-        # Call ChatGPT using the latest API structure
-        response = client.responses.create(
-            model=OPENAI_MODEL,
-            input=prompt
-        )
+        brands_data, places_data = await context.async_get_entities(limit)
+        if not brands_data or not places_data:
+            logger.error("❌ Failed to fetch data from Qloo API")
+            return {
+                "error": "Failed to fetch data from Qloo API",
+                "analysis": None
+            }
         
-        analysis = response.output_text
+        brands, places, prompt, fingerprint = _prepare_analysis(brands_data, places_data, city_name, country_code)
         
-        print(f"[ChatGPT Analysis] ✅ Analysis completed successfully, length: {len(analysis)}")
+        analysis = _memoized_analysis(fingerprint)
+        if analysis is None:
+            logger.info("🤖 Sending async request to ChatGPT...")
+            response = await _async_create_response('analysis', prompt)
+            analysis = response.output_text
+            _memoize_analysis(fingerprint, analysis, _response_tokens(response))
         
-        return {
-            "success": True,
-            "analysis": analysis,
-            "city": city_name,
-            "country": country_code,
-            "data_points": {
-                "brands_count": len(brands),
-                "places_count": len(places)
-            }
-        }
+        result = _analysis_result(analysis, brands, places, city_name, country_code)
+        context.set_analysis(limit, result)
+        return result
         
     except Exception as e:
-        print(f"[ChatGPT Analysis] 💥 Exception: {str(e)}")
-        print(f"[ChatGPT Analysis] 💥 Exception type: {type(e).__name__}")
-        import traceback
-        print(f"[ChatGPT Analysis] 💥 Full traceback: {traceback.format_exc()}")
+        logger.exception("💥 Async analysis failed: %s: %s", type(e).__name__, e)
         return {
             "error": f"Analysis failed: {str(e)}",
             "analysis": None
         }
 
+def _prepare_analysis(brands_data, places_data, city_name, country_code):
+    """Summarize fetched Qloo data and build the analysis prompt and its memo fingerprint"""
+    logger.debug("✅ Qloo data fetched successfully", extra=SAMPLED)
+    
+    # Extract key information from the data
+    brands = brands_data.get('results', {}).get('entities', [])
+    places = places_data.get('results', {}).get('entities', [])
+    
+    logger.debug("📊 Found %s brands and %s places", len(brands), len(places), extra=SAMPLED)
+    
+    # Prepare data summary for ChatGPT
+    logger.debug("🔄 Preparing data summary...", extra=SAMPLED)
+    data_summary = prepare_data_summary(brands, places, city_name, country_code)
+    
+    # Create prompt for ChatGPT
+    logger.debug("📝 Creating analysis prompt...", extra=SAMPLED)
+    prompt = create_analysis_prompt(data_summary, city_name, country_code)
+    
+    return brands, places, prompt, analysis_fingerprint(data_summary)
+
+def _memoized_analysis(fingerprint):
+    """Return the memoized analysis for fingerprint (crediting the saved tokens), or None"""
+    memoized = analysis_cache.get(fingerprint)
+    if memoized is None:
+        return None
+    analysis, tokens = memoized
+    _record_tokens("tokens_saved", tokens)
+    logger.info("⚡ Memoized analysis hit (%s), saved %s tokens", fingerprint[:12], tokens)
+    return analysis
+
+def _memoize_analysis(fingerprint, analysis, tokens):
+    _record_tokens("tokens_spent", tokens)
+    analysis_cache.set(fingerprint, (analysis, tokens), len(analysis.encode('utf-8')))
+
+def _analysis_result(analysis, brands, places, city_name, country_code):
+    logger.info("✅ Analysis completed successfully, length: %s", len(analysis))
+    return {
+        "success": True,
+        "analysis": analysis,
+        "city": city_name,
+        "country": country_code,
+        "data_points": {
+            "brands_count": len(brands),
+            "places_count": len(places)
+        }
+    }
+
 def prepare_data_summary(brands, places, city_name, country_code):
     """
     Prepare a summary of the Qloo data for ChatGPT analysis
@@ -255,9 +448,36 @@ def get_chat_response(user_message, city_name, country_code):
     """
     Get a chat response from ChatGPT about the business environment
     """
+    return _final_event(_chat_events(user_message, city_name, country_code, stream=False))
+
+def stream_chat_response(user_message, city_name, country_code):
+    """
+    Streaming variant of get_chat_response, yielding the same (event, payload)
+    tuples as stream_business_analysis.
+    """
+    return _chat_events(user_message, city_name, country_code, stream=True)
+
+def create_chat_prompt(analysis, user_message, city_name, country_code):
+    """
+    Create the context-aware chat prompt with improved system prompt
+    """
+    return f"""You are a business intelligence specialist for {city_name}, {country_code}. Provide direct, professional responses without AI assistant language.
+
+**BUSINESS CONTEXT:**
+{analysis}
+
+**USER INQUIRY:** {user_message}
+
+Provide a concise, professional response (100-150 words) that directly addresses the user's question using the business analysis above. If the question is outside the analysis scope, provide relevant business insights about {city_name}. Write in a professional tone suitable for business communications."""
+
+async def async_get_chat_response(user_message, city_name, country_code):
+    """
+    Async version of get_chat_response for the ASGI app
+    """
     try:
-        # First, get the business environment analysis
-        analysis_result = analyze_business_environment(city_name, country_code)
+        analysis_result = get_city_context(city_name, country_code).get_analysis()
+        if analysis_result is None:
+            analysis_result = await async_analyze_business_environment(city_name, country_code, DEFAULT_LIMIT)
         
         if analysis_result.get("error"):
             return {
@@ -265,21 +485,10 @@ def get_chat_response(user_message, city_name, country_code):
                 "response": None
             }
         
-        # Create a context-aware response with improved prompt
-        context_prompt = f"""You are a business intelligence specialist for {city_name}, {country_code}. Provide direct, professional responses without AI assistant language.
-
-**BUSINESS CONTEXT:**
-{analysis_result['analysis']}
-
-**USER INQUIRY:** {user_message}
-
-Provide a concise, professional response (100-150 words) that directly addresses the user's question using the business analysis above. If the question is outside the analysis scope, provide relevant business insights about {city_name}. Write in a professional tone suitable for business communications."""
-        
         if not OPENAI_API_KEY:
             return {"error": "Missing OPENAI_API_KEY in environment. Set it and restart the server.", "response": None}
-        response = client.responses.create(
-            model=OPENAI_MODEL,
-            input=context_prompt
+        response = await _async_create_response(
+            'chat', create_chat_prompt(analysis_result['analysis'], user_message, city_name, country_code)
         )
         
         return {
@@ -294,7 +503,46 @@ Provide a concise, professional response (100-150 words) that directly addresses
             "response": None
         }
 
+def _chat_events(user_message, city_name, country_code, stream):
+    try:
+        # Reuse the city's stored analysis; only generate one if none exists yet
+        analysis_result = get_city_context(city_name, country_code).get_analysis()
+        if analysis_result is None:
+            analysis_result = analyze_business_environment(city_name, country_code, DEFAULT_LIMIT)
+        
+        if analysis_result.get("error"):
+            yield "error", {
+                "error": analysis_result["error"],
+                "response": None
+            }
+            return
+        
+        # Create a context-aware response with improved prompt
+        context_prompt = create_chat_prompt(analysis_result['analysis'], user_message, city_name, country_code)
+        
+        if not OPENAI_API_KEY:
+            yield "error", {"error": "Missing OPENAI_API_KEY in environment. Set it and restart the server.", "response": None}
+            return
+        if stream:
+            response_text, _ = yield from _stream_deltas('chat', context_prompt)
+        else:
+            response = _create_response('chat', context_prompt)
+            response_text = response.output_text
+            yield "delta", {"text": response_text}
+        
+        yield "done", {
+            "success": True,
+            "response": response_text,
+            "analysis": analysis_result['analysis']
+        }
+        
+    except Exception as e:
+        yield "error", {
+            "error": f"Chat response failed: {str(e)}",
+            "response": None
+        }
+
 if __name__ == "__main__":
     # Test the analysis
-    result = analyze_business_environment("London", "GB", limit=30)
+    result = analyze_business_environment("London", "GB")
     print(json.dumps(result, indent=2)) 
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from qloo_analysis import fetch_brands_and_places, async_fetch_brands_and_places
+
+# --- City Context Configuration ---
+# Entities fetched per type when a request names no limit. Visualizations, analysis and
+# chat all default to it so they share one fetch and one stored analysis per city
+DEFAULT_LIMIT = int(os.getenv('DEFAULT_ENTITY_LIMIT', '20'))
+# How long fetched entities and generated analyses are reused for a city
+CONTEXT_TTL = float(os.getenv('CITY_CONTEXT_TTL', '900'))
+# Maximum number of cities kept in memory at once
+CONTEXT_MAX_CITIES = int(os.getenv('CITY_CONTEXT_MAX_CITIES', '256'))
+# Distinct limits a city keeps entities and analyses for; limit comes from the client,
+# so without a bound one city could hold a full Qloo response per value
+CONTEXT_MAX_LIMITS = int(os.getenv('CITY_CONTEXT_MAX_LIMITS', '4'))
+
+
+class CityContext:
+    """
+    Per-city session state shared by the analysis, chat and visualization endpoints.
+
+    Holds the Qloo entities fetched for the city (per limit) and the analyses
+    generated from them, so a chat turn can reuse the existing analysis
+    instead of refetching Qloo data and regenerating it. Only the
+    CONTEXT_MAX_LIMITS most recently used limits are kept.
+    """
+
+    def __init__(self, city_name, country_code):
+        self.city_name = city_name
+        self.country_code = country_code
+        self.created_at = time.time()
+        self._entities = {}  # (kind, limit) -> brands_data or places_data
+        self._analyses = {}  # limit -> analysis result dict
+        self._limits = OrderedDict()  # limits held above, least recently used first
+        self._latest_analysis = None
+        self._lock = threading.Lock()
+
+    def is_expired(self, now=None):
+        return ((now or time.time()) - self.created_at) > CONTEXT_TTL
+
+    def _use_limit(self, limit):
+        """Mark limit as most recently used and drop what the oldest limits hold (call with _lock held)."""
+        self._limits[limit] = None
+        self._limits.move_to_end(limit)
+        while len(self._limits) > CONTEXT_MAX_LIMITS:
+            old, _ = self._limits.popitem(last=False)
+            for kind in ('brands', 'places'):
+                self._entities.pop((kind, old), None)
+            self._analyses.pop(old, None)
+
+    def _cached_entities(self, limit, brands, places):
+        """Return (brands_data, places_data, missing kinds) from what this context already holds."""
+        with self._lock:
+            brands_data = self._entities.get(('brands', limit)) if brands else None
+            places_data = self._entities.get(('places', limit)) if places else None
+            if limit in self._limits:
+                self._limits.move_to_end(limit)
+        missing_brands = brands and brands_data is None
+        missing_places = places and places_data is None
+        return brands_data, places_data, missing_brands, missing_places
+
+    def _store_entities(self, limit, brands_data, places_data):
+        with self._lock:
+            if brands_data or places_data:
+                self._use_limit(limit)
+            if brands_data:
+                self._entities[('brands', limit)] = brands_data
+            if places_data:
+                self._entities[('places', limit)] = places_data
+
+    def get_entities(self, limit, brands=True, places=True):
+        """
+        Return (brands_data, places_data) for limit, fetching each list once per context.
+
+        Pass brands=False or places=False to skip an entity type the caller
+        does not need; its slot is None and no Qloo call is made for it.
+        """
+        brands_data, places_data, missing_brands, missing_places = self._cached_entities(limit, brands, places)
+        if missing_brands or missing_places:
+            fetched_brands, fetched_places = fetch_brands_and_places(
+                self.city_name, self.country_code, limit, brands=missing_brands, places=missing_places
+            )
+            self._store_entities(limit, fetched_brands, fetched_places)
+            brands_data = fetched_brands if missing_brands else brands_data
+            places_data = fetched_places if missing_places else places_data
+        return brands_data, places_data
+
+    async def async_get_entities(self, limit, brands=True, places=True):
+        """Async version of get_entities for the ASGI app."""
+        brands_data, places_data, missing_brands, missing_places = self._cached_entities(limit, brands, places)
+        if missing_brands or missing_places:
+            fetched_brands, fetched_places = await async_fetch_brands_and_places(
+                self.city_name, self.country_code, limit, brands=missing_brands, places=missing_places
+            )
+            self._store_entities(limit, fetched_brands, fetched_places)
+            brands_data = fetched_brands if missing_brands else brands_data
+            places_data = fetched_places if missing_places else places_data
+        return brands_data, places_data
+
+    def get_analysis(self, limit=None):
+        """Return the stored analysis for limit, or the most recent one when limit is None."""
+        with self._lock:
+            if limit is None:
+                return self._latest_analysis
+            return self._analyses.get(limit)
+
+    def set_analysis(self, limit, result):
+        with self._lock:
+            self._use_limit(limit)
+            self._analyses[limit] = result
+            self._latest_analysis = result
+
+
+_contexts = OrderedDict()  # (city, country) -> CityContext
+_contexts_lock = threading.Lock()
+
+
+def _context_key(city_name, country_code):
+    return (str(city_name or '').strip().casefold(), str(country_code or '').strip().upper())
+
+
+def get_city_context(city_name, country_code):
+    """Return the live context for a city, creating a fresh one if missing or expired."""
+    key = _context_key(city_name, country_code)
+    now = time.time()
+    with _contexts_lock:
+        context = _contexts.get(key)
+        if context is None or context.is_expired(now):
+            context = CityContext(city_name, country_code)
+            _contexts[key] = context
+        _contexts.move_to_end(key)
+        while len(_contexts) > CONTEXT_MAX_CITIES:
+            _contexts.popitem(last=False)
+        return context
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# --- Business classes ---
+# Charts simulate opening hours, price levels and seasonality from the kind of
+# business a place is. A tag belongs to a class when its lowercased name
+# contains one of the class keywords; classes are bit flags so an entity's
+# classes fit in one integer.
+DINING = 1 << 0      # restaurant, cafe, bar
+FOOD = 1 << 1        # other food places
+RETAIL = 1 << 2
+OFFICE = 1 << 3
+HOTEL = 1 << 4
+OUTDOOR = 1 << 5
+LUXURY = 1 << 6
+
+BUSINESS_CLASSES = {
+    DINING: ('restaurant', 'cafe', 'bar'),
+    FOOD: ('food',),
+    RETAIL: ('shop', 'store', 'retail'),
+    OFFICE: ('office', 'business', 'professional'),
+    HOTEL: ('hotel', 'accommodation'),
+    OUTDOOR: ('outdoor', 'park', 'beach'),
+    LUXURY: ('luxury', 'premium', 'high-end'),
+}
+
+_CLASS_PATTERNS = [
+    (flag, re.compile('|'.join(re.escape(word) for word in words)))
+    for flag, words in BUSINESS_CLASSES.items()
+]
+
+
+@lru_cache(maxsize=4096)
+def classify_tag(name):
+    """Return the business class bit flags for a tag name (0 if it matches none)."""
+    name = name.lower()
+    flags = 0
+    for flag, pattern in _CLASS_PATTERNS:
+        if pattern.search(name):
+            flags |= flag
+    return flags
+
+
+def parse_rating(value):
+    """
+    Qloo sends business_rating as a number, a numeric string, 'N/A' or not at all; missing is NaN.
+
+    0 and '0' are both a real 0.0 rating; views that leave zero ratings out filter them themselves.
+    """
+    if value is None or value == 'N/A':
+        return np.nan
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+class Vocabulary:
+    """Interns strings to dense integer codes, in first-seen order."""
+
+    def __init__(self):
+        self.codes = {}  # name -> code
+        self.names = []  # code -> name
+
+    def intern(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _csr(indptr, indices):
+    return np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int32)
+
+
+class EntityTable:
+    """
+    Columnar view of one Qloo entity list (brands or places).
+
+    Built in a single pass over the raw response:
+      - names, popularity and rating (NaN when missing) per entity
+      - category: code of the entity's first tag in category_vocab, -1 if untagged
+      - tags / keywords: interned names stored as CSR (entity i owns
+        tag_indices[tag_indptr[i]:tag_indptr[i + 1]])
+      - tag labels as the category charts count them: a tag without a name
+        key counts as 'Unknown' (label_vocab / label_counts())
+      - empty_tags: the entity carries a tags field with nothing in it
+      - the transposed tag -> entity index (tag_entity_indptr/indices)
+      - classes: OR of the business class flags of the entity's tags
+    """
+
+    def __init__(self, entities):
+        n = len(entities)
+        self.size = n
+        self.names = []
+        self.popularity = np.zeros(n, dtype=np.float64)
+        self.rating = np.full(n, np.nan, dtype=np.float64)
+        self.category = np.full(n, -1, dtype=np.int32)
+        self.classes = np.zeros(n, dtype=np.int32)
+        self.empty_tags = np.zeros(n, dtype=bool)
+        self.category_vocab = Vocabulary()
+        self.tag_vocab = Vocabulary()
+        self.label_vocab = Vocabulary()
+        self.keyword_vocab = Vocabulary()
+
+        tag_indptr, tag_indices, label_indices = [0], [], []
+        keyword_indptr, keyword_indices = [0], []
+        for i, entity in enumerate(entities):
+            self.names.append(entity.get('name', 'Unknown'))
+            self.popularity[i] = entity.get('popularity') or 0
+            properties = entity.get('properties') or {}
+            self.rating[i] = parse_rating(properties.get('business_rating'))
+
+            tags = entity.get('tags') or []
+            self.empty_tags[i] = 'tags' in entity and not tags
+            if tags and tags[0].get('name'):
+                self.category[i] = self.category_vocab.intern(tags[0]['name'])
+            classes = 0
+            for tag in tags:
+                if tag.get('name'):
+                    tag_indices.append(self.tag_vocab.intern(tag['name']))
+                    classes |= classify_tag(tag['name'])
+                label = tag.get('name', 'Unknown')
+                if label:
+                    label_indices.append(self.label_vocab.intern(label))
+            tag_indptr.append(len(tag_indices))
+            self.classes[i] = classes
+
+            for keyword in properties.get('keywords') or []:
+                if keyword.get('name'):
+                    keyword_indices.append(self.keyword_vocab.intern(keyword['name']))
+            keyword_indptr.append(len(keyword_indices))
+
+        self.tag_indptr, self.tag_indices = _csr(tag_indptr, tag_indices)
+        self.keyword_indptr, self.keyword_indices = _csr(keyword_indptr, keyword_indices)
+        self._label_counts = np.bincount(np.asarray(label_indices, dtype=np.int32), minlength=len(self.label_vocab))
+
+        # Transpose: for each tag, the entities carrying it (in entity order)
+        tag_owner = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.tag_indptr))
+        order = np.argsort(self.tag_indices, kind='stable')
+        self.tag_entity_indices = tag_owner[order]
+        self.tag_entity_indptr = np.concatenate(
+            ([0], np.cumsum(np.bincount(self.tag_indices, minlength=len(self.tag_vocab))))
+        ).astype(np.int64)
+
+    @classmethod
+    def from_response(cls, data):
+        """Build a table from a Qloo insights response, or None if it carries no entity list."""
+        if not data or 'results' not in data or 'entities' not in data['results']:
+            return None
+        return cls(data['results']['entities'] or [])
+
+    def tag_counts(self):
+        """Number of occurrences of each tag, indexed by tag code."""
+        return np.diff(self.tag_entity_indptr)
+
+    def label_counts(self):
+        """Number of occurrences of each tag label, indexed by label_vocab code."""
+        return self._label_counts
+
+    def keyword_counts(self):
+        return np.bincount(self.keyword_indices, minlength=len(self.keyword_vocab))
+
+    def tags_per_entity(self):
+        return np.diff(self.tag_indptr)
+
+    def entities_with_tag(self, name):
+        """Indices of the entities tagged with name."""
+        code = self.tag_vocab.codes.get(name)
+        if code is None:
+            return np.empty(0, dtype=np.int32)
+        return self.tag_entity_indices[self.tag_entity_indptr[code]:self.tag_entity_indptr[code + 1]]
+
+    def has_class(self, flags):
+        """Boolean mask of entities with a tag in any of the given business classes."""
+        return (self.classes & flags) != 0
+
+    def fingerprint_into(self, digest):
+        """Feed every normalized column into a hashlib digest."""
+        for array in (self.popularity, self.rating, self.category, self.tag_indptr, self.tag_indices,
+                      self.keyword_indptr, self.keyword_indices, self._label_counts, self.empty_tags):
+            digest.update(array.tobytes())
+        digest.update(json.dumps(
+            [self.names, self.category_vocab.names, self.tag_vocab.names, self.label_vocab.names,
+             self.keyword_vocab.names]
+        ).encode('utf-8'))
+
+    def category_names(self, default):
+        """Per-entity first-tag name, with default for untagged entities."""
+        names = self.category_vocab.names
+        return [names[code] if code >= 0 else default for code in self.category]
+
+    def category_index(self):
+        """
+        Group entities by first-tag category, in first-seen order.
+
+        Returns (codes, group): codes[g] is the category code of group g
+        (-1 for untagged entities) and group[i] is entity i's group, ready
+        for np.bincount-style aggregation.
+        """
+        codes, first_seen, inverse = np.unique(self.category, return_index=True, return_inverse=True)
+        order = np.argsort(first_seen, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        return codes[order], rank[inverse.ravel()]
+
+    def category_groups(self):
+        """(code, entity indices) per first-tag category, in first-seen order."""
+        codes, group = self.category_index()
+        members = np.argsort(group, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(group, minlength=len(codes)))))
+        return [(int(codes[g]), members[bounds[g]:bounds[g + 1]]) for g in range(len(codes))]
+
+
+def most_common(counts, names, n=None):
+    """Counter.most_common over a counts array: descending, ties kept in code order."""
+    order = np.argsort(-counts, kind='stable')
+    if n is not None:
+        order = order[:n]
+    return [(names[i], int(counts[i])) for i in order if counts[i] > 0]
+
+
+class CityDataset:
+    """Brands and places for one city, normalized once and shared by every chart."""
+
+    def __init__(self, brands_data, places_data):
+        self.brands = EntityTable.from_response(brands_data)
+        self.places = EntityTable.from_response(places_data)
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        """Stable hex digest of the normalized data; equal datasets give equal fingerprints."""
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for table in (self.brands, self.places):
+                if table is None:
+                    digest.update(b'\x00none')
+                else:
+                    digest.update(b'\x01table')
+                    table.fingerprint_into(digest)
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
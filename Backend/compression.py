@@ -0,0 +1,157 @@
+"""
+Negotiated gzip/brotli compression for API responses.
+
+Chart JSON is highly repetitive and typically shrinks 5-10x. Responses are
+compressed in an after_request hook when the client accepts it, the body is
+large enough to be worth it and the content type is text-like. Responses
+carrying an ETag (the cacheable GET /api/visualizations, small static
+files) keep their compressed bytes in a small cache, so a repeat of a
+cached response is not compressed again.
+
+Brotli is used when the brotli package is installed and the client prefers
+it; gzip otherwise.
+"""
+import gzip
+import os
+
+from cache import TTLCache
+import metrics
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# --- Compression Configuration ---
+# Bodies smaller than this are sent as-is (headers and CPU would outweigh the saving)
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+# Dynamic responses favour speed: gzip 6 and brotli 5 get most of the ratio at a fraction of the max-level cost
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+# Compressed bodies of ETagged responses, keyed by (path, etag, encoding)
+COMPRESSED_CACHE_MAX_BYTES = int(os.getenv('COMPRESSED_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+COMPRESSED_CACHE_TTL = float(os.getenv('COMPRESSED_CACHE_TTL', '3600'))
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'image/svg+xml',
+}
+
+compressed_cache = TTLCache(max_bytes=COMPRESSED_CACHE_MAX_BYTES, ttl=COMPRESSED_CACHE_TTL, name="compressed")
+metrics.register_cache(compressed_cache)
+
+
+def choose_encoding(accept_encoding, available=None):
+    """
+    Pick 'br' or 'gzip' from an Accept-Encoding header (None for identity), honouring q-values.
+
+    available limits the choice, e.g. to the precompressed files that exist;
+    by default it is what this process can compress with.
+    """
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    if available is None:
+        available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    candidates = [coding for coding in ('br', 'gzip') if coding in available]
+    if not candidates:
+        return None
+    wildcard = accepted.get('*', 0.0)
+    ranked = [(accepted.get(coding, wildcard), -i, coding) for i, coding in enumerate(candidates)]
+    q, _, coding = max(ranked)
+    return coding if q > 0 else None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode_body(body, accept_encoding, cache_key=None):
+    """
+    Return (encoding, compressed body) for a response body, or None to send it as-is.
+
+    With a cache_key (request path and ETag) the compressed bytes are looked
+    up in (and stored to) compressed_cache, so identical responses are
+    compressed once.
+    """
+    if len(body) < COMPRESS_MIN_BYTES:
+        return None
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return None
+    if cache_key:
+        cached = compressed_cache.get((*cache_key, encoding))
+        if cached is not None:
+            return encoding, cached
+    data = compress(body, encoding)
+    if len(data) >= len(body):
+        return None
+    if cache_key:
+        compressed_cache.set((*cache_key, encoding), data, len(data))
+    return encoding, data
+
+
+def _should_compress(response):
+    return (
+        response.status_code == 200
+        and response.mimetype in COMPRESSIBLE_TYPES
+        and 'Content-Encoding' not in response.headers
+        and 'no-transform' not in response.headers.get('Cache-Control', '')
+    )
+
+
+def _apply(response, result, etag):
+    """Swap in the compressed body. The ETag turns weak, as the bytes now depend on the coding."""
+    encoding, data = result
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        response.set_etag(etag, weak=True)
+
+
+def init_compression(app):
+    """Compress a Flask app's responses (streams and send_file responses are left alone)."""
+    from flask import request
+
+    @app.after_request
+    def compress_response(response):
+        if response.direct_passthrough or response.is_streamed or not _should_compress(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        etag = response.get_etag()[0]
+        result = encode_body(
+            response.get_data(), request.headers.get('Accept-Encoding'), (request.path, etag) if etag else None
+        )
+        if result:
+            _apply(response, result, etag)
+        return response
+
+
+def init_async_compression(app):
+    """Compress a Quart app's in-memory responses (file and streamed bodies are left alone)."""
+    from quart import request
+    from quart.wrappers.response import DataBody
+
+    @app.after_request
+    async def compress_response(response):
+        if not isinstance(response.response, DataBody) or not _should_compress(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        etag = response.get_etag()[0]
+        result = encode_body(
+            await response.get_data(), request.headers.get('Accept-Encoding'), (request.path, etag) if etag else None
+        )
+        if result:
+            _apply(response, result, etag)
+        return response
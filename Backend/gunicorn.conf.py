@@ -0,0 +1,97 @@
+"""
+Gunicorn settings for serving Palatlas in production.
+
+Usage (from the Backend directory):
+    gunicorn -c gunicorn.conf.py hybrid_app:app
+
+Every setting can be overridden through the environment, e.g. WEB_CONCURRENCY=4.
+"""
+import math
+import multiprocessing
+import os
+
+# Bind to the port provided by the platform (Railway/Docker set PORT)
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+
+def available_cpus():
+    """
+    CPUs this container may use: the cgroup CPU quota when one is set,
+    otherwise the CPUs the process is allowed to run on.
+
+    multiprocessing.cpu_count() reports the host's CPUs inside Docker and
+    Railway, which can be far more than the container is given.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else multiprocessing.cpu_count()
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: a quota of -1 means unlimited
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+            if quota > 0:
+                cpus = min(cpus, max(1, math.ceil(quota / period)))
+        except (OSError, ValueError):
+            pass
+    return cpus
+
+
+# Pre-fork workers, each running a small thread pool. Requests mostly wait on
+# Qloo and OpenAI, so threads keep a worker busy while it waits on the network.
+# Every worker holds its own caches (Qloo responses, figures, compressed bodies,
+# city contexts) and, with CHART_WORKERS, its own chart pool, so the default
+# stays at GUNICORN_MAX_WORKERS however many CPUs are visible.
+MAX_WORKERS = int(os.environ.get('GUNICORN_MAX_WORKERS', '4'))
+workers = int(os.environ.get('WEB_CONCURRENCY', min(available_cpus() * 2 + 1, MAX_WORKERS)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# HTTP keep-alive between the edge proxy and workers
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Analysis calls can take a while; graceful_timeout bounds shutdown on SIGTERM
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+
+# Recycle workers periodically to cap memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# Import the app (and its heavy dependencies) once in the master before forking
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    print(f"🚀 Starting Palatlas with {workers} workers x {threads} threads on {bind} (preload: {preload_app})")
+    if preload_app:
+        # The app imports plotly, pandas and the OpenAI SDK lazily; pay for them
+        # once here so every forked worker shares the already-imported modules
+        import plotly.graph_objects  # noqa: F401
+        import pandas  # noqa: F401
+        import openai  # noqa: F401
+
+
+def worker_exit(server, worker):
+    # Close pooled upstream connections and the fetch pool so shutdown is clean
+    try:
+        from qloo_analysis import close
+        close()
+    except Exception as e:
+        print(f"⚠️ Error closing Qloo client on worker exit: {e}")
+    # Stop the chart process pool, if CHART_WORKERS enabled one
+    try:
+        from visualizations import close_chart_pool
+        close_chart_pool()
+    except Exception as e:
+        print(f"⚠️ Error closing chart pool on worker exit: {e}")
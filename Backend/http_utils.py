@@ -0,0 +1,54 @@
+import json
+
+from flask import Response, request, stream_with_context
+
+
+def wants_stream(data):
+    """True when the client asked for a streamed response (body "stream": true or ?stream=1)"""
+    if isinstance(data, dict) and data.get('stream'):
+        return True
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def event_stream_response(events):
+    """
+    Relay (event, payload) tuples to the browser as they are produced.
+
+    Clients sending "Accept: application/x-ndjson" get one JSON object per
+    line ({"event": ..., **payload}); everyone else gets Server-Sent Events
+    with the payload JSON-encoded in the data field.
+    """
+    ndjson = 'application/x-ndjson' in request.headers.get('Accept', '')
+
+    def generate():
+        for event, payload in events:
+            if ndjson:
+                yield json.dumps({"event": event, **payload}) + "\n"
+            else:
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson' if ndjson else 'text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies (nginx, Railway's edge) from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def is_not_modified(req, etag, last_modified=None):
+    """
+    True when the client's cached copy is still current, so a 304 can be sent.
+
+    If-None-Match wins over If-Modified-Since when both are present, and is
+    compared weakly (compressed responses carry the weak form of the ETag).
+    Without last_modified only If-None-Match is honoured.
+    Works with Flask and Quart requests alike (both are werkzeug requests).
+    """
+    if req.if_none_match:
+        return req.if_none_match.contains_weak(etag)
+    if req.if_modified_since and last_modified is not None:
+        return int(last_modified) <= req.if_modified_since.timestamp()
+    return False
+
@@ -0,0 +1,181 @@
+"""
+Logging for the Palatlas backend.
+
+Modules log through logging.getLogger(__name__); each app calls
+configure_logging() once at import. Request threads only put records on a
+queue (QueueHandler). A QueueListener thread formats them and writes them
+to stdout, so slow stdout never stalls a request.
+
+Records are JSON lines by default, each one carrying the request_id of
+the request that logged it. Set LOG_FORMAT=text for readable
+development logs. Per-step detail on hot paths is logged at DEBUG with
+extra=SAMPLED. When DEBUG is enabled, only LOG_SAMPLE_RATE of requests
+keep those lines, and a sampled request keeps all of them.
+
+Environment:
+    LOG_LEVEL        minimum level (default INFO)
+    LOG_FORMAT       json or text (default json)
+    LOG_SAMPLE_RATE  fraction of requests whose sampled DEBUG lines are kept (default 0.01)
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+import zlib
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))
+
+# Pass as extra= on hot-path debug lines that should be sampled
+SAMPLED = {'sampled': True}
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id', 'sampled'}
+
+
+def new_request_id():
+    """Start a request: make a short id and attach it to everything logged in this context."""
+    request_id = uuid.uuid4().hex[:8]
+    request_id_var.set(request_id)
+    return request_id
+
+
+def init_request_ids(app):
+    """
+    Give every request of a Flask app a fresh request_id, health checks and static files included.
+
+    Register before the other hooks so their lines carry it too. Without it a
+    reused worker thread would log under the previous request's id.
+    """
+    @app.before_request
+    def start_request_id():
+        new_request_id()
+
+
+def init_async_request_ids(app):
+    """Quart version of init_request_ids."""
+    @app.before_request
+    async def start_request_id():
+        new_request_id()
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Stamp the current request_id on each record and drop unsampled SAMPLED lines.
+
+    Runs on the logging thread, before the record is queued. Sampling is
+    decided per request (a hash of its id), so a kept request keeps all of
+    its detail lines.
+    """
+
+    def __init__(self, sample_rate):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        request_id = request_id_var.get()
+        record.request_id = request_id
+        if getattr(record, 'sampled', False):
+            if request_id is None:
+                return random.random() < self.sample_rate
+            return (zlib.crc32(request_id.encode()) % 10000) < self.sample_rate * 10000
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Render the message and traceback now, while args are still current, but leave
+        # the layout to the listener's formatter
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id, any extra= fields and exc."""
+
+    converter = time.gmtime
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(request_id)s %(name)s: %(message)s')
+
+    def format(self, record):
+        record.request_id = getattr(record, 'request_id', None) or '-'
+        return super().format(record)
+
+
+_queue_handler = None
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JsonFormatter())
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, stream)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The listener thread does not survive fork (gunicorn preload); give the child its own
+    if _queue_handler is not None:
+        _start_listener()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    if _listener is not None:
+        _listener.stop()
+
+
+def configure_logging():
+    """Install the queue handler on the root logger (idempotent)."""
+    global _queue_handler
+    if _queue_handler is not None:
+        return
+    _queue_handler = _QueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(RequestContextFilter(LOG_SAMPLE_RATE))
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(LOG_LEVEL)
+    # httpx logs every request at INFO; upstream calls are logged here instead
+    for name in ('httpx', 'httpcore', 'urllib3', 'openai'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    _start_listener()
+    atexit.register(stop_logging)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,255 @@
+"""
+In-process metrics for the Palatlas backend, served as Prometheus text at GET /api/metrics.
+
+Hot paths are timed into histograms:
+    palatlas_http_request_seconds{method,route,status}  whole requests (init_metrics)
+    palatlas_upstream_seconds{service,operation}         Qloo brands/places and OpenAI calls
+    palatlas_chart_build_seconds{chart}                  each create_* chart builder
+    palatlas_chart_serialize_seconds{chart}              figure -> JSON
+Upstream failures (HTTP errors, network and decode errors, missed deadlines)
+count into palatlas_upstream_errors_total{service,operation,reason}. Caches
+registered with register_cache() are read at scrape time and exported as
+palatlas_cache_* series with a hit ratio.
+
+Metrics live in the process that recorded them: every gunicorn/hypercorn
+worker keeps its own registry, so scrape each worker (or sum across them).
+Charts built in the process pool are timed in the child and recorded here
+by the parent.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans a cache hit (sub-millisecond) up to a slow upstream call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+_caches = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+
+
+class Histogram:
+    """Observations bucketed per label combination, with their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = (('le', _format_value(bound)),)
+                yield f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}'
+
+
+REQUEST_SECONDS = Histogram(
+    'palatlas_http_request_seconds', 'Time to produce an HTTP response', ('method', 'route', 'status')
+)
+UPSTREAM_SECONDS = Histogram(
+    'palatlas_upstream_seconds', 'Time spent in a Qloo or OpenAI call', ('service', 'operation')
+)
+UPSTREAM_ERRORS = Counter(
+    'palatlas_upstream_errors_total', 'Failed Qloo or OpenAI calls', ('service', 'operation', 'reason')
+)
+CHART_BUILD_SECONDS = Histogram(
+    'palatlas_chart_build_seconds', 'Time in a create_* chart builder', ('chart',)
+)
+CHART_SERIALIZE_SECONDS = Histogram(
+    'palatlas_chart_serialize_seconds', 'Time encoding a chart figure as JSON', ('chart',)
+)
+LLM_TOKENS = Counter(
+    'palatlas_llm_tokens_total', 'Tokens billed for LLM calls (spent) and avoided by memoized analyses (saved)', ('kind',)
+)
+
+
+def upstream_error(service, operation, reason):
+    UPSTREAM_ERRORS.inc(service=service, operation=operation, reason=reason)
+
+
+@contextmanager
+def upstream_call(service, operation):
+    """Time an upstream call; an exception escaping the block is counted as an error by its type."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        upstream_error(service, operation, type(e).__name__)
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, service=service, operation=operation)
+
+
+def observe_chart(chart, build_seconds, serialize_seconds):
+    CHART_BUILD_SECONDS.observe(build_seconds, chart=chart)
+    if serialize_seconds is not None:
+        CHART_SERIALIZE_SECONDS.observe(serialize_seconds, chart=chart)
+
+
+def register_cache(cache):
+    """Export a TTLCache, SQLiteCache or (Async)SingleFlight's stats() at scrape time (None is ignored)."""
+    if cache is not None:
+        with _registry_lock:
+            _caches.append(cache)
+
+
+# stats() field -> (metric, type, help)
+_CACHE_FIELDS = (
+    ('hits', 'palatlas_cache_hits_total', 'counter', 'Cache lookups that found a live entry'),
+    ('misses', 'palatlas_cache_misses_total', 'counter', 'Cache lookups that found nothing'),
+    ('hit_rate', 'palatlas_cache_hit_ratio', 'gauge', 'Hits over lookups since start'),
+    ('evictions', 'palatlas_cache_evictions_total', 'counter', 'Entries dropped to stay under the byte budget'),
+    ('errors', 'palatlas_cache_errors_total', 'counter', 'Failed reads or writes of the on-disk cache'),
+    ('entries', 'palatlas_cache_entries', 'gauge', 'Entries currently held'),
+    ('bytes', 'palatlas_cache_bytes', 'gauge', 'Approximate bytes currently held'),
+    ('executions', 'palatlas_singleflight_executions_total', 'counter', 'Calls that ran the underlying fetch'),
+    ('coalesced', 'palatlas_singleflight_coalesced_total', 'counter', 'Calls that joined a fetch already in flight'),
+    ('in_flight', 'palatlas_singleflight_in_flight', 'gauge', 'Fetches currently in flight'),
+)
+
+
+def _render_caches():
+    with _registry_lock:
+        caches = list(_caches)
+    stats = [cache.stats() for cache in caches]
+    lines = []
+    for field, name, kind, help in _CACHE_FIELDS:
+        rows = [(s['name'], s[field]) for s in stats if s.get(field) is not None]
+        if not rows:
+            continue
+        lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(f'{name}{_format_labels(("cache",), (cache,))} {_format_value(value)}' for cache, value in rows)
+    return lines
+
+
+def render():
+    """Every metric in the Prometheus text exposition format (0.0.4)."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    lines.extend(_render_caches())
+    return '\n'.join(lines) + '\n'
+
+
+def _route(request):
+    # The URL rule, not the path, so /assets/<hash>.js does not make a series per file
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def init_metrics(app):
+    """Time every request of a Flask app. Register before other after_request hooks so they are included."""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=request.method, route=_route(request), status=response.status_code
+            )
+        return response
+
+
+def init_async_metrics(app):
+    """Quart version of init_metrics."""
+    from quart import g, request
+
+    @app.before_request
+    async def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    async def observe_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=request.method, route=_route(request), status=response.status_code
+            )
+        return response
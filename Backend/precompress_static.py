@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Write .gz (and, with the Brotli package, .br) siblings for the built frontend.
+
+Run after copying the Vite build into Backend/static; static_files.py then
+serves the precompressed file to clients that accept it, so text assets are
+compressed once at maximum level instead of on every request.
+
+Usage (from the Backend directory):
+    python precompress_static.py [static_dir]
+"""
+import gzip
+import os
+import sys
+
+from compression import brotli, COMPRESSIBLE_TYPES
+from static_files import STATIC_DIR, PRECOMPRESSED, StaticEntry
+
+# Tiny files gain nothing once headers are counted
+MIN_BYTES = 1024
+
+
+def precompress(root):
+    written = saved = 0
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(tuple(PRECOMPRESSED.values())):
+                continue
+            path = os.path.join(directory, filename)
+            if StaticEntry.guess_type(path) not in COMPRESSIBLE_TYPES or os.path.getsize(path) < MIN_BYTES:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants['br'] = brotli.compress(data, quality=11)
+            for encoding, compressed in variants.items():
+                if len(compressed) < len(data):
+                    with open(path + PRECOMPRESSED[encoding], 'wb') as f:
+                        f.write(compressed)
+                    written += 1
+                    saved += len(data) - len(compressed)
+    print(f"🗜️ Wrote {written} precompressed file(s) in {root}, {saved / 1024:.0f} KB smaller in total")
+
+
+if __name__ == '__main__':
+    precompress(sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR)
@@ -1,7 +1,20 @@
+import logging
 import requests
+from requests.adapters import HTTPAdapter
+import httpx
+import asyncio
+import contextvars
 import os
 import json
 import time
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from cache import TTLCache, SQLiteCache, SingleFlight, AsyncSingleFlight
+from log_config import SAMPLED
+import metrics
+
+logger = logging.getLogger(__name__)
 
 # --- Qloo API Configuration ---
 API_KEY = os.getenv('QLOO_API_KEY', 'rZ4JDgPEmJBGYuLtY233M_l0Jxm0QdLXFs6N-6XYaA0') # Ensure this is your actual Qloo API Key
@@ -12,13 +25,148 @@ headers = {
     "X-Api-Key": API_KEY
 }
 
-# --- Helper Function for Qloo API Request ---
-def get_brands(city_name, country_code, limit, signal_tags=None, signal_weight=1.0):
+# --- Concurrent Fetch Configuration ---
+# Upper bound on simultaneous Qloo calls issued by fetch_brands_and_places
+FETCH_WORKERS = int(os.getenv('QLOO_FETCH_WORKERS', '8'))
+# Shared deadline (seconds) for a brands+places fetch
+FETCH_DEADLINE = float(os.getenv('QLOO_FETCH_DEADLINE', '30'))
+
+_fetch_pool = None
+_fetch_pool_lock = threading.Lock()
+
+# --- HTTP Client Configuration ---
+# Connections kept alive to the Qloo host; sized to the fetch worker count by default
+POOL_SIZE = int(os.getenv('QLOO_POOL_SIZE', str(FETCH_WORKERS)))
+CONNECT_TIMEOUT = float(os.getenv('QLOO_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.getenv('QLOO_READ_TIMEOUT', '20'))
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def get_session():
     """
-    Helper function to make the API request.
+    Return the shared keep-alive session used for every Qloo request.
+
+    The session owns a per-host connection pool so repeat calls reuse TCP+TLS
+    connections instead of handshaking each time. It is rebuilt after a fork
+    so worker processes never share sockets with their parent.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                session.headers.update(headers)
+                session.headers["Accept-Encoding"] = "gzip, deflate"
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+                _session_pid = pid
+    return _session
+
+# --- Response Cache Configuration ---
+# Qloo insights change slowly, so identical queries are served from memory for CACHE_TTL seconds
+CACHE_TTL = float(os.getenv('QLOO_CACHE_TTL', '900'))
+CACHE_MAX_BYTES = int(os.getenv('QLOO_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Shared on-disk tier behind the memory cache; set QLOO_CACHE_DIR to an empty string to disable it
+CACHE_DIR = os.getenv('QLOO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'palatlas-cache'))
+
+def _open_disk_cache():
+    """Open the on-disk tier, or return None when it is disabled or unusable."""
+    if not CACHE_DIR:
+        return None
+    try:
+        return SQLiteCache(os.path.join(CACHE_DIR, 'qloo_responses.sqlite3'), CACHE_TTL, name="qloo_disk")
+    except OSError as e:
+        logger.warning("⚠️ Disk cache disabled, cannot use %s: %s", CACHE_DIR, e)
+        return None
+
+response_cache = TTLCache(CACHE_MAX_BYTES, CACHE_TTL, name="qloo_memory")
+disk_cache = _open_disk_cache()
+
+# Identical queries that miss the cache while a fetch is already in flight wait on that fetch
+inflight = SingleFlight(name="qloo_inflight")
+async_inflight = AsyncSingleFlight(name="qloo_async_inflight")
+
+for _cache in (response_cache, disk_cache, inflight, async_inflight):
+    metrics.register_cache(_cache)
+
+def make_cache_key(params):
+    """
+    Build a normalized cache key from Qloo query params.
+
+    City names are case-folded, country codes upper-cased and signal tags
+    sorted, so equivalent queries share one cache entry.
+    """
+    tags = params.get("signal.interests.tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    tags = sorted(str(tag).strip() for tag in tags if str(tag).strip())
+    key = [
+        params.get("filter.type"),
+        str(params.get("filter.location.query") or "").strip().casefold(),
+        str(params.get("filter.geocode.country_code") or "").strip().upper(),
+        str(params.get("take")),
+        tags,
+        params.get("signal.interests.tags.weight") if tags else None,
+    ]
+    return json.dumps(key, separators=(',', ':'))
+
+def _cached_response(cache_key):
+    """Look a response up in memory, then on disk, promoting disk hits to memory."""
+    data = response_cache.get(cache_key)
+    if data is None and disk_cache is not None:
+        data = _promote_from_disk(cache_key)
+    return data
+
+def _promote_from_disk(cache_key):
+    """Read a response from the disk tier and copy it into memory for its remaining TTL."""
+    entry = disk_cache.get_entry(cache_key)
+    if entry is None:
+        return None
+    data, size, ttl_remaining = entry
+    response_cache.set(cache_key, data, size, ttl=ttl_remaining)
+    return data
+
+def _store_response(cache_key, data, size):
+    """Cache a successful insights response; error payloads are never cached."""
+    if data and 'results' in data and 'entities' in data['results']:
+        response_cache.set(cache_key, data, size)
+        if disk_cache is not None:
+            disk_cache.set(cache_key, data)
+
+def cache_stats():
+    """Return hit/miss counters for both cache tiers and the coalescing counter."""
+    return {
+        "memory": response_cache.stats(),
+        "disk": disk_cache.stats() if disk_cache is not None else None,
+        "inflight": inflight.stats(),
+        "async_inflight": async_inflight.stats(),
+    }
+
+def _operation(params):
+    """Metrics label for a query: 'brands' or 'places'."""
+    return 'brands' if params["filter.type"] == "urn:entity:brand" else 'places'
+
+def _qloo_get(params):
+    """Issue a GET to the Qloo insights endpoint through the pooled session, timed and error-counted."""
+    operation = _operation(params)
+    with metrics.upstream_call('qloo', operation):
+        response = get_session().get(URL, params=params, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    if response.status_code >= 400:
+        metrics.upstream_error('qloo', operation, f'http_{response.status_code}')
+    return response
+
+def build_params(entity_type, city_name, country_code, limit, signal_tags=None, signal_weight=1.0):
+    """
+    Build the insights query params shared by the sync and async fetch helpers.
     """
     params = {
-        "filter.type": "urn:entity:brand",
+        "filter.type": entity_type,
         "filter.location.query": city_name,
         "filter.geocode.country_code": country_code,
         "take": limit,
@@ -29,30 +177,55 @@ def get_brands(city_name, country_code, limit, signal_tags=None, signal_weight=1
         else:
             params["signal.interests.tags"] = signal_tags
         params["signal.interests.tags.weight"] = signal_weight
+    return params
 
-    print(f"[QLOO] 🔍 Fetching brands for: {city_name}, {country_code}, limit: {limit}")
-    print(f"[QLOO] 📡 API params: {params}")
+# --- Helper Function for Qloo API Request ---
+def get_brands(city_name, country_code, limit, signal_tags=None, signal_weight=1.0):
+    """
+    Helper function to make the API request.
+    """
+    params = build_params("urn:entity:brand", city_name, country_code, limit, signal_tags, signal_weight)
+
+    cache_key = make_cache_key(params)
+    cached = _cached_response(cache_key)
+    if cached is not None:
+        logger.debug("⚡ Cache hit for brands: %s, %s, limit: %s", city_name, country_code, limit, extra=SAMPLED)
+        return cached
+
+    # Concurrent callers for the same normalized query share one request
+    return inflight.do(cache_key, _request_brands, params, cache_key)
+
+def _request_brands(params, cache_key):
+    """
+    Make the brands API request and cache a successful response.
+    """
+    city_name = params["filter.location.query"]
+    country_code = params["filter.geocode.country_code"]
+    limit = params["take"]
+
+    logger.info("🔍 Fetching brands for: %s, %s, limit: %s", city_name, country_code, limit)
+    logger.debug("📡 API params: %s", params, extra=SAMPLED)
 
     try:
-        response = requests.get(URL, headers=headers, params=params)
+        response = _qloo_get(params)
         response.raise_for_status()
         data = response.json()
         
         # Debug: Check what we got back
         if data and 'results' in data and 'entities' in data['results']:
-            brand_names = [brand.get('name', 'Unknown') for brand in data['results']['entities'][:3]]
-            print(f"[QLOO] ✅ Brands API response: {len(data['results']['entities'])} brands")
-            print(f"[QLOO] 📊 First 3 brands: {brand_names}")
+            logger.info("✅ Brands API response: %s brands", len(data['results']['entities']))
+            logger.debug("📊 First 3 brands: %s", [brand.get('name', 'Unknown') for brand in data['results']['entities'][:3]], extra=SAMPLED)
         else:
-            print(f"[QLOO] ⚠️ No valid brands in API response")
-            print(f"[QLOO] 📄 Raw response: {data}")
+            logger.warning("⚠️ No valid brands in API response: %.200s", data)
         
+        _store_response(cache_key, data, len(response.content))
         return data
     except requests.exceptions.RequestException as e:
-        print(f"[QLOO] ❌ Error making Qloo API request: {e}")
+        logger.error("❌ Error making Qloo API request: %s", e)
         return None
     except json.JSONDecodeError:
-        print(f"[QLOO] ❌ Error decoding JSON from Qloo API response: {response.text}")
+        metrics.upstream_error('qloo', 'brands', 'decode')
+        logger.error("❌ Error decoding JSON from Qloo API response: %.200s", response.text)
         return None
 
 # (get_places function remains the same, so it's omitted for brevity)
@@ -60,73 +233,247 @@ def get_places(city_name, country_code, limit, signal_tags=None, signal_weight=1
     """
     Helper function to make the Qloo API request with basic retry logic.
     """
-    params = {
-        "filter.type": "urn:entity:place",
-        "filter.location.query": city_name,
-        "filter.geocode.country_code": country_code,
-        "take": limit,
-    }
-    if signal_tags:
-        if isinstance(signal_tags, str) and ',' in signal_tags:
-            params["signal.interests.tags"] = signal_tags.split(',')
-        else:
-            params["signal.interests.tags"] = signal_tags
-        params["signal.interests.tags.weight"] = signal_weight
-    else:
-        params.pop("signal.interests.tags", None)
-        params.pop("signal.interests.tags.weight", None)
+    params = build_params("urn:entity:place", city_name, country_code, limit, signal_tags, signal_weight)
 
-    print(f"[QLOO] 🔍 Fetching places for: {city_name}, {country_code}, limit: {limit}")
-    print(f"[QLOO] 📡 API params: {params}")
+    cache_key = make_cache_key(params)
+    cached = _cached_response(cache_key)
+    if cached is not None:
+        logger.debug("⚡ Cache hit for places: %s, %s, limit: %s", city_name, country_code, limit, extra=SAMPLED)
+        return cached
+
+    # Concurrent callers for the same normalized query share one request
+    return inflight.do(cache_key, _request_places, params, cache_key, max_retries)
+
+def _request_places(params, cache_key, max_retries):
+    """
+    Make the places API request with basic retry logic and cache a successful response.
+    """
+    city_name = params["filter.location.query"]
+    country_code = params["filter.geocode.country_code"]
+    limit = params["take"]
+
+    logger.info("🔍 Fetching places for: %s, %s, limit: %s", city_name, country_code, limit)
+    logger.debug("📡 API params: %s", params, extra=SAMPLED)
 
     for attempt in range(max_retries):
         try:
-            response = requests.get(URL, headers=headers, params=params)
+            response = _qloo_get(params)
             response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
             data = response.json()
             
             # Debug: Check what we got back
             if data and 'results' in data and 'entities' in data['results']:
-                place_names = [place.get('name', 'Unknown') for place in data['results']['entities'][:3]]
-                print(f"[QLOO] ✅ Places API response: {len(data['results']['entities'])} places")
-                print(f"[QLOO] 🏢 First 3 places: {place_names}")
+                logger.info("✅ Places API response: %s places", len(data['results']['entities']))
+                logger.debug("🏢 First 3 places: %s", [place.get('name', 'Unknown') for place in data['results']['entities'][:3]], extra=SAMPLED)
             else:
-                print(f"[QLOO] ⚠️ No valid places in API response")
-                print(f"[QLOO] 📄 Raw response: {data}")
+                logger.warning("⚠️ No valid places in API response: %.200s", data)
             
+            _store_response(cache_key, data, len(response.content))
             return data
         except requests.exceptions.HTTPError as http_err:
-            print(f"[QLOO] ❌ HTTP error occurred during Qloo API request (Attempt {attempt+1}/{max_retries}): {http_err} - Status Code: {response.status_code}")
+            logger.error("❌ HTTP error occurred during Qloo API request (Attempt %s/%s): %s - Status Code: %s", attempt + 1, max_retries, http_err, response.status_code)
             if response.status_code == 401 or response.status_code == 403:
-                print("[QLOO] 🔐 Authentication error (401/403). Please check your QLOO_API_KEY.")
+                logger.error("🔐 Authentication error (401/403). Please check your QLOO_API_KEY.")
                 return None # Don't retry on auth errors
             if attempt < max_retries - 1:
                 sleep_time = 2 ** attempt # Exponential backoff
-                print(f"[QLOO] ⏳ Retrying in {sleep_time} seconds...")
+                logger.warning("⏳ Retrying in %s seconds...", sleep_time)
                 time.sleep(sleep_time)
             else:
-                print("[QLOO] ❌ Max retries reached for Qloo API request.")
+                logger.error("❌ Max retries reached for Qloo API request.")
                 return None
         except requests.exceptions.RequestException as req_err:
-            print(f"[QLOO] ❌ Network/Request error occurred during Qloo API request (Attempt {attempt+1}/{max_retries}): {req_err}")
+            logger.error("❌ Network/Request error occurred during Qloo API request (Attempt %s/%s): %s", attempt + 1, max_retries, req_err)
             if attempt < max_retries - 1:
                 sleep_time = 2 ** attempt
-                print(f"[QLOO] ⏳ Retrying in {sleep_time} seconds...")
+                logger.warning("⏳ Retrying in %s seconds...", sleep_time)
                 time.sleep(sleep_time)
             else:
-                print("[QLOO] ❌ Max retries reached for Qloo API request.")
+                logger.error("❌ Max retries reached for Qloo API request.")
                 return None
         except json.JSONDecodeError:
-            print(f"[QLOO] ❌ Error decoding JSON from Qloo API response (Attempt {attempt+1}/{max_retries}). Response text: {response.text}")
+            metrics.upstream_error('qloo', 'places', 'decode')
+            logger.error("❌ Error decoding JSON from Qloo API response (Attempt %s/%s). Response text: %.200s", attempt + 1, max_retries, response.text)
             if attempt < max_retries - 1:
                 sleep_time = 2 ** attempt
-                print(f"[QLOO] ⏳ Retrying in {sleep_time} seconds...")
+                logger.warning("⏳ Retrying in %s seconds...", sleep_time)
                 time.sleep(sleep_time)
             else:
-                print("[QLOO] ❌ Max retries reached for Qloo API request.")
+                logger.error("❌ Max retries reached for Qloo API request.")
                 return None
     return None # Return None if all retries fail
+
+def _get_fetch_pool():
+    """Create the shared fetch pool on first use (after any pre-fork import)."""
+    global _fetch_pool
+    if _fetch_pool is None:
+        with _fetch_pool_lock:
+            if _fetch_pool is None:
+                _fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="qloo-fetch")
+    return _fetch_pool
+
+def fetch_brands_and_places(city_name, country_code, limit, deadline=None, brands=True, places=True):
+    """
+    Fetch brands and places for a city concurrently.
+
+    Both Qloo calls are issued at the same time on a bounded thread pool and
+    gathered against one shared deadline. Returns (brands_data, places_data);
+    a call that fails or misses the deadline yields None in its slot, the same
+    as get_brands/get_places do on error. Pass brands=False or places=False to
+    skip a call entirely (its slot is None).
+    """
+    deadline = FETCH_DEADLINE if deadline is None else deadline
+    pool = _get_fetch_pool()
+
+    kinds = ' and '.join(kind for kind, wanted in (('brands', brands), ('places', places)) if wanted)
+    logger.debug("🔀 Fetching %s concurrently for: %s, %s, limit: %s", kinds, city_name, country_code, limit, extra=SAMPLED)
+    # Run each call in a copy of this context so its log lines keep the caller's request_id
+    brands_future = pool.submit(contextvars.copy_context().run, get_brands, city_name, country_code, limit) if brands else None
+    places_future = pool.submit(contextvars.copy_context().run, get_places, city_name, country_code, limit) if places else None
+
+    futures = [future for future in (brands_future, places_future) if future is not None]
+    done, not_done = wait(futures, timeout=deadline)
+    for future in not_done:
+        future.cancel()
+        metrics.upstream_error('qloo', 'brands' if future is brands_future else 'places', 'deadline')
+    if not_done:
+        logger.warning("⏱️ %s Qloo call(s) missed the %ss deadline for %s, %s", len(not_done), deadline, city_name, country_code)
+
+    def _result(future):
+        if future is None or future not in done:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error("❌ Concurrent fetch failed: %s", e)
+            return None
+
+    return _result(brands_future), _result(places_future)
     
+def close():
+    """Shut down the fetch pool and close pooled connections (called on worker exit)."""
+    global _fetch_pool, _session
+    with _fetch_pool_lock:
+        if _fetch_pool is not None:
+            _fetch_pool.shutdown(wait=False, cancel_futures=True)
+            _fetch_pool = None
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+# --- Async Qloo Client (used by the ASGI app) ---
+# One event loop can keep this many upstream connections open at once
+ASYNC_POOL_SIZE = int(os.getenv('QLOO_ASYNC_POOL_SIZE', '200'))
+
+_async_client = None
+_async_client_loop = None
+
+def _get_async_client():
+    """Return the shared httpx.AsyncClient for the running event loop."""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            headers={**headers, "Accept-Encoding": "gzip, deflate"},
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=ASYNC_POOL_SIZE, max_keepalive_connections=ASYNC_POOL_SIZE),
+        )
+        _async_client_loop = loop
+    return _async_client
+
+async def async_close():
+    """Close the async client's connections (called when the ASGI app stops serving)."""
+    global _async_client, _async_client_loop
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+        _async_client_loop = None
+
+async def _async_cached_query(params, max_retries):
+    """Serve params from the cache tiers, or fetch once per in-flight normalized query."""
+    cache_key = make_cache_key(params)
+    cached = response_cache.get(cache_key)
+    if cached is None and disk_cache is not None:
+        cached = await asyncio.to_thread(_promote_from_disk, cache_key)
+    if cached is not None:
+        logger.debug("⚡ Cache hit for %s: %s, %s", params['filter.type'], params['filter.location.query'], params['filter.geocode.country_code'], extra=SAMPLED)
+        return cached
+    return await async_inflight.do(cache_key, _async_request, params, cache_key, max_retries)
+
+async def _async_request(params, cache_key, max_retries):
+    """
+    Make an insights request on the async client with the same retry policy as get_places.
+    """
+    logger.info("🔍 Async fetch for: %s, %s, %s, limit: %s", params['filter.type'], params['filter.location.query'], params['filter.geocode.country_code'], params['take'])
+    client = _get_async_client()
+    operation = _operation(params)
+    for attempt in range(max_retries):
+        try:
+            with metrics.upstream_call('qloo', operation):
+                response = await client.get(URL, params=params)
+            if response.status_code >= 400:
+                metrics.upstream_error('qloo', operation, f'http_{response.status_code}')
+            response.raise_for_status()
+            try:
+                data = response.json()
+            except ValueError:
+                metrics.upstream_error('qloo', operation, 'decode')
+                raise
+            await asyncio.to_thread(_store_response, cache_key, data, len(response.content))
+            return data
+        except httpx.HTTPStatusError as http_err:
+            logger.error("❌ HTTP error occurred during async Qloo API request (Attempt %s/%s): %s", attempt + 1, max_retries, http_err)
+            if http_err.response.status_code in (401, 403):
+                logger.error("🔐 Authentication error (401/403). Please check your QLOO_API_KEY.")
+                return None # Don't retry on auth errors
+        except (httpx.HTTPError, ValueError) as err:
+            logger.error("❌ Network/decoding error during async Qloo API request (Attempt %s/%s): %s", attempt + 1, max_retries, err)
+        if attempt < max_retries - 1:
+            sleep_time = 2 ** attempt
+            logger.warning("⏳ Retrying in %s seconds...", sleep_time)
+            await asyncio.sleep(sleep_time)
+    logger.error("❌ Max retries reached for async Qloo API request.")
+    return None
+
+async def async_get_brands(city_name, country_code, limit, signal_tags=None, signal_weight=1.0):
+    """
+    Async version of get_brands (single attempt, shared cache).
+    """
+    params = build_params("urn:entity:brand", city_name, country_code, limit, signal_tags, signal_weight)
+    return await _async_cached_query(params, max_retries=1)
+
+async def async_get_places(city_name, country_code, limit, signal_tags=None, signal_weight=1.0, max_retries=3):
+    """
+    Async version of get_places (retries with exponential backoff, shared cache).
+    """
+    params = build_params("urn:entity:place", city_name, country_code, limit, signal_tags, signal_weight)
+    return await _async_cached_query(params, max_retries=max_retries)
+
+async def async_fetch_brands_and_places(city_name, country_code, limit, deadline=None, brands=True, places=True):
+    """
+    Async version of fetch_brands_and_places: both calls run concurrently under one deadline.
+    """
+    deadline = FETCH_DEADLINE if deadline is None else deadline
+    brands_task = asyncio.ensure_future(async_get_brands(city_name, country_code, limit)) if brands else None
+    places_task = asyncio.ensure_future(async_get_places(city_name, country_code, limit)) if places else None
+    tasks = [task for task in (brands_task, places_task) if task is not None]
+    if not tasks:
+        return None, None
+    done, not_done = await asyncio.wait(tasks, timeout=deadline)
+    for task in not_done:
+        task.cancel()
+        metrics.upstream_error('qloo', 'brands' if task is brands_task else 'places', 'deadline')
+    if not_done:
+        logger.warning("⏱️ %s async Qloo call(s) missed the %ss deadline for %s, %s", len(not_done), deadline, city_name, country_code)
+
+    def _result(task):
+        if task is None or task not in done or task.exception() is not None:
+            return None
+        return task.result()
+
+    return _result(brands_task), _result(places_task)
+
 def format_brands_output(api_data):
     """
     Formats the JSON response from the get_brands function into a readable string.
@@ -248,4 +595,4 @@ if __name__ == "__main__":
     #     formatted_output = format_brands_output(birmingham_data)
     #     print(formatted_output)
     # else:
-    #     print("Could not retrieve brand data.")
\ No newline at end of file
+    #     print("Could not retrieve brand data.")
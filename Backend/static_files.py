@@ -0,0 +1,146 @@
+"""
+Serving the built React frontend from Backend/static.
+
+The directory is indexed once at startup, so a request is a dict lookup
+rather than exists/listdir calls. Each file carries its content type,
+validators and any precompressed .br/.gz siblings (see
+precompress_static.py); small files are held in memory. Vite's hashed
+assets/* bundles never change under the same name and are cached as
+immutable; everything else, index.html included, revalidates on each use.
+"""
+import logging
+import mimetypes
+import os
+
+from compression import choose_encoding
+from http_utils import is_not_modified
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+# Files up to this size are read into memory at startup; larger ones are streamed from disk
+STATIC_MEMORY_MAX_FILE = int(os.getenv('STATIC_MEMORY_MAX_FILE', str(256 * 1024)))
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+PRECOMPRESSED = {'br': '.br', 'gzip': '.gz'}
+_EXTRA_TYPES = {'.js': 'text/javascript', '.mjs': 'text/javascript', '.svg': 'image/svg+xml', '.webmanifest': 'application/manifest+json'}
+
+
+class StaticFile:
+    """One servable representation: a file on disk, or its bytes when small enough."""
+
+    __slots__ = ('path', 'size', 'etag', 'data')
+
+    def __init__(self, path, etag):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.etag = etag
+        self.data = None
+        if self.size <= STATIC_MEMORY_MAX_FILE:
+            with open(path, 'rb') as f:
+                self.data = f.read()
+
+
+class StaticEntry:
+    """A URL path with its identity file and precompressed variants (encoding -> StaticFile)."""
+
+    def __init__(self, url_path, path):
+        self.url_path = url_path
+        self.mimetype = self.guess_type(path)
+        self.last_modified = int(os.path.getmtime(path))
+        base_etag = f"{self.last_modified:x}-{os.path.getsize(path):x}"
+        self.identity = StaticFile(path, base_etag)
+        self.variants = {}
+        for encoding, suffix in PRECOMPRESSED.items():
+            if os.path.isfile(path + suffix):
+                variant = StaticFile(path + suffix, f"{base_etag}-{encoding}")
+                if variant.size < self.identity.size:
+                    self.variants[encoding] = variant
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if url_path.startswith('assets/') else REVALIDATE_CACHE_CONTROL
+
+    @staticmethod
+    def guess_type(path):
+        ext = os.path.splitext(path)[1].lower()
+        return _EXTRA_TYPES.get(ext) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    def select(self, accept_encoding):
+        """(encoding or None, StaticFile) for the client's Accept-Encoding"""
+        if self.variants:
+            encoding = choose_encoding(accept_encoding, available=list(self.variants))
+            if encoding:
+                return encoding, self.variants[encoding]
+        return None, self.identity
+
+
+class StaticIndex:
+    """Every file under root by URL path, with index.html as the fallback for client-side routes."""
+
+    def __init__(self, root=STATIC_DIR):
+        self.root = root
+        self.entries = {}
+        if os.path.isdir(root):
+            for directory, _, filenames in os.walk(root):
+                for filename in filenames:
+                    if filename.endswith(tuple(PRECOMPRESSED.values())):
+                        continue
+                    path = os.path.join(directory, filename)
+                    url_path = os.path.relpath(path, root).replace(os.sep, '/')
+                    self.entries[url_path] = StaticEntry(url_path, path)
+        self.index = self.entries.get('index.html')
+        logger.info("📁 Indexed %s static file(s) from %s", len(self.entries), root)
+        if self.index is None:
+            logger.warning("⚠️ No index.html in %s; the frontend will not be served", root)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def resolve(self, url_path):
+        """The entry for url_path, index.html for unknown paths, or None without a frontend build"""
+        return self.entries.get(url_path) or self.index
+
+
+def _headers(response, entry, encoding, static_file):
+    response.set_etag(static_file.etag)
+    response.last_modified = entry.last_modified
+    response.headers['Cache-Control'] = entry.cache_control
+    if entry.variants:
+        response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def send_static(index, url_path):
+    """Flask response for url_path: 304, in-memory bytes or a streamed file."""
+    from flask import Response, request, send_file
+
+    entry = index.resolve(url_path)
+    if entry is None:
+        return Response('Frontend not built', status=404, mimetype='text/plain')
+    encoding, static_file = entry.select(request.headers.get('Accept-Encoding'))
+    if is_not_modified(request, static_file.etag, entry.last_modified):
+        return _headers(Response(status=304), entry, encoding, static_file)
+    if static_file.data is not None:
+        response = Response(static_file.data, mimetype=entry.mimetype)
+    else:
+        response = send_file(static_file.path, mimetype=entry.mimetype, etag=False, conditional=False)
+    return _headers(response, entry, encoding, static_file)
+
+
+async def async_send_static(index, url_path):
+    """Quart version of send_static."""
+    from quart import Response, request, send_file
+
+    entry = index.resolve(url_path)
+    if entry is None:
+        return Response('Frontend not built', status=404, mimetype='text/plain')
+    encoding, static_file = entry.select(request.headers.get('Accept-Encoding'))
+    if is_not_modified(request, static_file.etag, entry.last_modified):
+        return _headers(Response(status=304), entry, encoding, static_file)
+    if static_file.data is not None:
+        response = Response(static_file.data, mimetype=entry.mimetype)
+    else:
+        response = await send_file(static_file.path, mimetype=entry.mimetype, add_etags=False)
+    return _headers(response, entry, encoding, static_file)
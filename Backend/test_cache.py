@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Checks for the response caches in cache.py
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import AsyncSingleFlight, SingleFlight, SQLiteCache, TTLCache
+
+
+def check(label, actual, expected):
+    if actual == expected:
+        print(f"✅ {label}")
+        return True
+    print(f"❌ {label}: expected {expected!r}, got {actual!r}")
+    return False
+
+
+def test_ttl_expiry():
+    print("🧪 Testing TTLCache expiry...")
+    cache = TTLCache(max_bytes=1024, ttl=0.05)
+    cache.set('short', 'a', 1)
+    cache.set('long', 'b', 1, ttl=60)
+    results = [check("fresh entry", cache.get('short'), 'a')]
+    time.sleep(0.1)
+    results += [
+        check("expired entry", cache.get('short'), None),
+        check("per-entry ttl outlives the default", cache.get('long'), 'b'),
+        check("expired entry's bytes are released", cache.stats()['bytes'], 1),
+        check("hits and misses", (cache.hits, cache.misses), (2, 1)),
+    ]
+    return all(results)
+
+
+def test_byte_budget():
+    print("🧪 Testing TTLCache byte-budget eviction...")
+    cache = TTLCache(max_bytes=10, ttl=60)
+    cache.set('a', 'A', 4)
+    cache.set('b', 'B', 4)
+    cache.get('a')  # 'b' is now the least recently used
+    cache.set('c', 'C', 4)
+    results = [
+        check("least recently used entry evicted", cache.get('b'), None),
+        check("recently read entry kept", cache.get('a'), 'A'),
+        check("new entry kept", cache.get('c'), 'C'),
+        check("bytes within budget", cache.stats()['bytes'], 8),
+        check("evictions", cache.evictions, 1),
+    ]
+    cache.set('huge', 'H', 11)
+    results.append(check("value over the whole budget skipped", (cache.get('huge'), len(cache)), (None, 2)))
+    cache.set('a', 'A2', 6)
+    results.append(check("replacing an entry re-counts its size", (cache.stats()['bytes'], cache.get('c')), (10, 'C')))
+    return all(results)
+
+
+def test_sqlite_round_trip():
+    print("🧪 Testing SQLiteCache round trip...")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'qloo', 'cache.db')
+        cache = SQLiteCache(path, ttl=60)
+        value = {'results': {'entities': [{'name': 'Café', 'popularity': 0.5}]}}
+        cache.set('brands:london', value)
+        entry = cache.get_entry('brands:london')
+        results = [
+            check("value read back", cache.get('brands:london'), value),
+            check("ttl remaining", 0 < entry[2] <= 60, True),
+            # Another worker opens the same file with its own instance
+            check("shared through the file", SQLiteCache(path, ttl=60).get('brands:london'), value),
+            check("missing key", cache.get('places:london'), None),
+        ]
+        cache.set('short', 'x', ttl=-1)
+        results.append(check("expired row is a miss", cache.get('short'), None))
+        cache.set('bad', object())
+        results.append(check("unserializable value counted as an error", cache.errors, 1))
+        with sqlite3.connect(path) as conn:
+            conn.execute("UPDATE entries SET payload = ? WHERE key = 'brands:london'", (b'not zlib',))
+        results += [
+            check("corrupt row is a miss", cache.get('brands:london'), None),
+            check("corrupt row counted as an error", cache.errors, 2),
+        ]
+    return all(results)
+
+
+def test_sqlite_purge():
+    print("🧪 Testing SQLiteCache purge...")
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SQLiteCache(os.path.join(directory, 'cache.db'), ttl=60)
+        cache.PURGE_EVERY = 4
+        for i in range(3):
+            cache.set(f'old-{i}', i, ttl=-1)
+        results = [check("expired rows kept until a purge", cache.stats()['entries'], 3)]
+        cache.set('live', 'kept')  # fourth write purges
+        results += [
+            check("expired rows purged", cache.stats()['entries'], 1),
+            check("live row kept", cache.get('live'), 'kept'),
+        ]
+    return all(results)
+
+
+def test_single_flight():
+    print("🧪 Testing SingleFlight coalescing...")
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fetch(key):
+        calls.append(key)
+        release.wait(5)
+        return {'key': key}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flight.do, 'london', fetch, 'london') for _ in range(8)]
+        # Let every caller reach do() before the leader's fetch returns
+        deadline = time.monotonic() + 5
+        while flight.stats()['coalesced'] < 7 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        values = [future.result() for future in futures]
+
+    results = [
+        check("one fetch for concurrent callers", calls, ['london']),
+        check("every caller gets the result", values, [{'key': 'london'}] * 8),
+        check("stats", flight.stats(), {'name': 'singleflight', 'in_flight': 0, 'executions': 1, 'coalesced': 7}),
+    ]
+    flight.do('london', fetch, 'london')
+    results.append(check("a later call fetches again", len(calls), 2))
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    try:
+        flight.do('paris', fail)
+        raised = None
+    except RuntimeError as e:
+        raised = str(e)
+    results += [
+        check("the leader's exception is raised", raised, "upstream down"),
+        check("a failed key is not left in flight", flight.stats()['in_flight'], 0),
+    ]
+    return all(results)
+
+
+def test_async_single_flight():
+    print("🧪 Testing AsyncSingleFlight coalescing...")
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return {'key': key}
+
+    async def run():
+        values = await asyncio.gather(*(flight.do('london', fetch, 'london') for _ in range(5)))
+        # A cancelled waiter does not cancel the fetch the others share
+        waiter = asyncio.ensure_future(flight.do('paris', fetch, 'paris'))
+        other = asyncio.ensure_future(flight.do('paris', fetch, 'paris'))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        return values, await other
+
+    values, other = asyncio.run(run())
+    return all([
+        check("one fetch per key", calls, ['london', 'paris']),
+        check("every caller gets the result", values, [{'key': 'london'}] * 5),
+        check("shared fetch survives a cancelled waiter", other, {'key': 'paris'}),
+        check("stats", (flight.executions, flight.coalesced, flight.stats()['in_flight']), (2, 5, 0)),
+    ])
+
+
+if __name__ == '__main__':
+    tests = [
+        test_ttl_expiry, test_byte_budget, test_sqlite_round_trip, test_sqlite_purge,
+        test_single_flight, test_async_single_flight,
+    ]
+    success = all([test() for test in tests])
+    sys.exit(0 if success else 1)
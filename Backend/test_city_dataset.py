@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Parity checks for the columnar city dataset
+
+The reference functions below are the per-chart loops the visualizer used
+before city_dataset.py; the normalized columns must give the same numbers
+for the awkward inputs Qloo sends (0 and '0' ratings, 'N/A', missing values,
+tags without a name, empty tag lists).
+"""
+import sys
+from collections import Counter
+
+import numpy as np
+
+from city_dataset import CityDataset, parse_rating
+from visualizations import QlooVisualizer
+
+RATINGS = [0, '0', None, 'N/A', '', 'abc', 4.5, '3.2', 5, 2]
+
+
+def make_places(ratings=RATINGS):
+    places = []
+    for i, rating in enumerate(ratings):
+        places.append({
+            'name': f'place-{i}',
+            'popularity': 0.1 * i,
+            'tags': [{'name': 'Restaurant' if i % 2 else 'Shop'}],
+            'properties': {'business_rating': rating},
+        })
+    places.append({'name': 'no-rating', 'tags': [{'name': 'Shop'}], 'properties': {}})
+    return {'results': {'entities': places}}
+
+
+def reference_density_ratings(entities):
+    """Ratings plotted by the density scatter: everything float() accepts, 'N/A' and missing excluded"""
+    ratings = []
+    for place in entities:
+        rating = place.get('properties', {}).get('business_rating', 'N/A')
+        try:
+            value = float(rating) if rating != 'N/A' else None
+        except (ValueError, TypeError):
+            value = None
+        if value is not None:
+            ratings.append(value)
+    return ratings
+
+
+def reference_price_ratings(entities):
+    """Ratings the price-range simulation starts from: unrated places count as 3.0"""
+    ratings = []
+    for place in entities:
+        rating = place.get('properties', {}).get('business_rating', 'N/A')
+        try:
+            ratings.append(float(rating) if rating != 'N/A' else 3.0)
+        except (ValueError, TypeError):
+            ratings.append(3.0)
+    return ratings
+
+
+def reference_listed_ratings(entities):
+    """Ratings shown by the top-rated list and the histogram: falsy ratings were skipped"""
+    ratings = []
+    for place in entities:
+        rating = place.get('properties', {}).get('business_rating')
+        if rating and rating != 'N/A':
+            try:
+                ratings.append(float(rating))
+            except (ValueError, TypeError):
+                continue
+    return ratings
+
+
+def make_tagged_places():
+    tag_lists = [
+        [{'name': 'Cafe'}, {'id': 'urn:tag:unnamed'}],
+        [],
+        [{'id': 'urn:tag:unnamed'}, {'name': 'Bar'}],
+        # A null first-tag name was shown as a null category; it is 'General' now
+        [{'name': 'Cafe'}, {'name': None}, {'name': ''}],
+        None,
+        [{'name': 'Bar'}],
+    ]
+    places = [
+        {'name': f'tagged-{i}', 'tags': tags, 'properties': {'business_rating': 5 - i * 0.5}}
+        for i, tags in enumerate(tag_lists)
+    ]
+    # No tags field at all: the old top-rated list showed it as 'General'
+    places.append({'name': 'untagged', 'properties': {'business_rating': 4.9}})
+    return {'results': {'entities': places}}
+
+
+def reference_tag_counts(entities, n):
+    """Slices of the brand/place category charts: a tag without a name key counted as 'Unknown'"""
+    labels = []
+    for entity in entities:
+        for tag in entity.get('tags') or []:
+            tag_name = tag.get('name', 'Unknown')
+            if tag_name:
+                labels.append(tag_name)
+    return Counter(labels).most_common(n)
+
+
+def reference_top_rated(entities, limit=5):
+    """The old get_top_rated_places: places with an empty tags list raised IndexError and were skipped"""
+    places_with_ratings = []
+    for place in entities:
+        rating = place.get('properties', {}).get('business_rating')
+        if rating and rating != 'N/A':
+            try:
+                places_with_ratings.append({
+                    'name': place.get('name', 'Unknown'),
+                    'rating': float(rating),
+                    'category': place.get('tags', [{}])[0].get('name', 'General')
+                })
+            except (ValueError, TypeError, IndexError):
+                continue
+    return sorted(places_with_ratings, key=lambda p: p['rating'], reverse=True)[:limit]
+
+
+def check(label, actual, expected):
+    if actual == expected:
+        print(f"✅ {label}")
+        return True
+    print(f"❌ {label}: expected {expected}, got {actual}")
+    return False
+
+
+def test_parse_rating():
+    print("🧪 Testing parse_rating...")
+    results = [
+        check("numeric 0 is a rating", parse_rating(0), 0.0),
+        check("string '0' is a rating", parse_rating('0'), 0.0),
+        check("numeric string", parse_rating('3.2'), 3.2),
+    ]
+    for value in (None, 'N/A', '', 'abc'):
+        results.append(check(f"{value!r} is missing", bool(np.isnan(parse_rating(value))), True))
+    return all(results)
+
+
+def test_rating_parity():
+    print("🧪 Testing rating parity with the per-chart loops...")
+    data = make_places()
+    entities = data['results']['entities']
+    places = CityDataset(None, data).places
+    rated = places.rating[~np.isnan(places.rating)].tolist()
+    results = [
+        check("density ratings", rated, reference_density_ratings(entities)),
+        check("price-range ratings", np.where(np.isnan(places.rating), 3.0, places.rating).tolist(),
+              reference_price_ratings(entities)),
+    ]
+
+    visualizer = QlooVisualizer()
+    visualizer.set_data(None, data)
+    density = visualizer.create_business_density_analysis('Testville', 'GB')
+    results.append(check("density scatter keeps zero ratings", list(density.data[0].y), reference_density_ratings(entities)))
+
+    # '0' was listed before while 0 was not; both are zero ratings now and both are left out
+    listed = [rating for rating in reference_listed_ratings(entities) if rating != 0]
+    top = visualizer.get_top_rated_places(limit=len(entities))
+    results.append(check("top-rated ratings", [place['rating'] for place in top], sorted(listed, reverse=True)))
+    histogram = visualizer.create_place_ratings_distribution('Testville', 'GB')
+    results.append(check("histogram count", int(sum(histogram.data[0].y)), len(listed)))
+    return all(results)
+
+
+def test_tag_parity():
+    print("🧪 Testing tag parity with the per-chart loops...")
+    data = make_tagged_places()
+    entities = data['results']['entities']
+    visualizer = QlooVisualizer()
+    visualizer.set_data(data, data)
+
+    pie = visualizer.create_brand_categories_pie('Testville', 'GB')
+    bars = visualizer.create_place_categories_chart('Testville', 'GB')
+    bar_counts = sorted(zip(bars.data[0].y, bars.data[0].x), key=lambda item: (-item[1], item[0]))
+    return all([
+        check("brand category slices", list(zip(pie.data[0].labels, pie.data[0].values)), reference_tag_counts(entities, 8)),
+        check("place category bars", bar_counts,
+              sorted(reference_tag_counts(entities, 12), key=lambda item: (-item[1], item[0]))),
+        check("top-rated places", visualizer.get_top_rated_places(), reference_top_rated(entities)),
+    ])
+
+
+if __name__ == '__main__':
+    tests = [test_parse_rating, test_rating_parity, test_tag_parity]
+    success = all([test() for test in tests])
+    sys.exit(0 if success else 1)
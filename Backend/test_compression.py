@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Checks for Accept-Encoding negotiation and response compression
+"""
+import gzip
+import sys
+
+from compression import COMPRESS_MIN_BYTES, choose_encoding, encode_body
+
+BOTH = ['br', 'gzip']
+
+
+def check(label, actual, expected):
+    if actual == expected:
+        print(f"✅ {label}")
+        return True
+    print(f"❌ {label}: expected {expected!r}, got {actual!r}")
+    return False
+
+
+def test_choose_encoding():
+    print("🧪 Testing choose_encoding q-values...")
+    return all([
+        check("no header", choose_encoding(None, BOTH), None),
+        check("identity only", choose_encoding('identity', BOTH), None),
+        check("brotli preferred on a tie", choose_encoding('gzip, deflate, br', BOTH), 'br'),
+        check("higher q wins", choose_encoding('br;q=0.5, gzip;q=0.8', BOTH), 'gzip'),
+        check("q=0 refuses a coding", choose_encoding('br;q=0, gzip', BOTH), 'gzip'),
+        check("everything refused", choose_encoding('br;q=0, gzip;q=0', BOTH), None),
+        check("wildcard", choose_encoding('*', BOTH), 'br'),
+        check("explicit q overrides the wildcard", choose_encoding('*;q=0.5, br;q=0.1', BOTH), 'gzip'),
+        check("wildcard q=0 excludes unlisted codings", choose_encoding('gzip;q=0.2, *;q=0', BOTH), 'gzip'),
+        check("malformed q counts as 0", choose_encoding('br;q=high, gzip', BOTH), 'gzip'),
+        check("case and spaces ignored", choose_encoding(' GZIP ; q=1.0 ', BOTH), 'gzip'),
+        check("limited to what is available", choose_encoding('br, gzip;q=0.1', ['gzip']), 'gzip'),
+        check("nothing available", choose_encoding('br', ['gzip']), None),
+    ])
+
+
+def test_encode_body():
+    print("🧪 Testing encode_body...")
+    body = b'{"chart": "' + b'x' * COMPRESS_MIN_BYTES + b'"}'
+    result = encode_body(body, 'gzip')
+    return all([
+        check("small body sent as-is", encode_body(b'{}', 'gzip'), None),
+        check("client without gzip", encode_body(body, 'identity'), None),
+        check("gzip coding", result[0] if result else None, 'gzip'),
+        check("gzip round trip", gzip.decompress(result[1]) if result else None, body),
+    ])
+
+
+if __name__ == '__main__':
+    tests = [test_choose_encoding, test_encode_body]
+    success = all([test() for test in tests])
+    sys.exit(0 if success else 1)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Checks for the conditional GET /api/visualizations
+
+Qloo is replaced by fixed entity lists, so the GET -> ETag -> 304 round
+trip runs offline, with and without a compressed body.
+"""
+import sys
+
+import city_context
+from app import app
+
+TAGS = ['Restaurant', 'Cafe', 'Bar', 'Retail Store', 'Office', 'Hotel', 'Park', 'Luxury']
+QUERY = '/api/visualizations?city={city}&country=GB&compact=1&version=2'
+
+
+def make_entities(kind, n=20):
+    entities = []
+    for i in range(n):
+        properties = {'address': f'{i} High Street'}
+        if kind == 'place':
+            properties['business_rating'] = round(1 + (i % 9) * 0.5, 1)
+            properties['keywords'] = [{'name': 'cozy'}, {'name': 'brunch' if i % 2 else 'view'}]
+        entities.append({
+            'name': f'{kind}-{i}',
+            'popularity': (i + 1) / n,
+            'tags': [{'name': TAGS[i % len(TAGS)]}, {'name': TAGS[(i * 3) % len(TAGS)]}],
+            'properties': properties,
+        })
+    return {'results': {'entities': entities}}
+
+
+def fake_fetch(city_name, country_code, limit, brands=True, places=True):
+    """Fixed entity lists; a city named 'Offline' has its places call fail."""
+    brands_data = make_entities('brand') if brands else None
+    places_data = make_entities('place') if places and city_name != 'Offline' else None
+    return brands_data, places_data
+
+
+def check(label, actual, expected):
+    if actual == expected:
+        print(f"✅ {label}")
+        return True
+    print(f"❌ {label}: expected {expected!r}, got {actual!r}")
+    return False
+
+
+def test_round_trip():
+    print("🧪 Testing GET -> ETag -> 304...")
+    url = QUERY.format(city='Testville')
+    with app.test_client() as client:
+        first = client.get(url, headers={'Accept-Encoding': 'identity'})
+        etag = first.headers.get('ETag', '')
+        bare = etag[2:]
+        results = [
+            check("first GET", first.status_code, 200),
+            check("ETag is weak", etag.startswith('W/"'), True),
+            check("no Last-Modified", first.headers.get('Last-Modified'), None),
+        ]
+        revisit = client.get(url, headers={'If-None-Match': etag, 'Accept-Encoding': 'identity'})
+        results += [
+            check("revalidation", revisit.status_code, 304),
+            check("304 ETag", revisit.headers.get('ETag'), etag),
+            check("304 body", revisit.data, b''),
+        ]
+        # A client holding the strong form still matches (If-None-Match compares weakly)
+        results.append(check("strong If-None-Match", client.get(url, headers={'If-None-Match': bare}).status_code, 304))
+        results.append(check("other ETag", client.get(url, headers={'If-None-Match': 'W/"other"'}).status_code, 200))
+    return all(results)
+
+
+def test_compressed_round_trip():
+    print("🧪 Testing the round trip with a gzip body...")
+    url = QUERY.format(city='Zipville')
+    with app.test_client() as client:
+        plain = client.get(url, headers={'Accept-Encoding': 'identity'})
+        gzipped = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        etag = gzipped.headers.get('ETag')
+        revisit = client.get(url, headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+        return all([
+            check("gzip body", gzipped.headers.get('Content-Encoding'), 'gzip'),
+            check("same ETag with and without gzip", etag, plain.headers.get('ETag')),
+            check("gzip revalidation", revisit.status_code, 304),
+            check("gzip 304 ETag", revisit.headers.get('ETag'), etag),
+            check("identity client revalidates the gzip ETag",
+                  client.get(url, headers={'If-None-Match': etag, 'Accept-Encoding': 'identity'}).status_code, 304),
+        ])
+
+
+def test_incomplete_response():
+    print("🧪 Testing a response missing Qloo data...")
+    with app.test_client() as client:
+        response = client.get(QUERY.format(city='Offline'))
+        return all([
+            check("status", response.status_code, 200),
+            check("Cache-Control", response.headers.get('Cache-Control'), 'no-store'),
+            check("no ETag", response.headers.get('ETag'), None),
+        ])
+
+
+if __name__ == '__main__':
+    city_context.fetch_brands_and_places = fake_fetch
+    tests = [test_round_trip, test_compressed_round_trip, test_incomplete_response]
+    success = all([test() for test in tests])
+    sys.exit(0 if success else 1)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Checks for the charts= selection and the rendered-figure cache
+"""
+import sys
+
+import city_context
+from app import app
+from visualizations import SELECTABLE, QlooVisualizer, entity_types_for, figure_cache, select_charts
+
+
+def make_data(n=12, shift=0.0):
+    tags = ['Restaurant', 'Cafe', 'Bar', 'Retail Store', 'Hotel']
+    entities = [
+        {
+            'name': f'entity-{i}',
+            'popularity': (i + 1) / n + shift,
+            'tags': [{'name': tags[i % len(tags)]}],
+            'properties': {'business_rating': 1 + i % 5},
+        }
+        for i in range(n)
+    ]
+    return {'results': {'entities': entities}}
+
+
+def check(label, actual, expected):
+    if actual == expected:
+        print(f"✅ {label}")
+        return True
+    print(f"❌ {label}: expected {expected!r}, got {actual!r}")
+    return False
+
+
+def rejects(charts):
+    try:
+        select_charts(charts)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def test_select_charts():
+    print("🧪 Testing select_charts...")
+    return all([
+        check("None selects everything", select_charts(None), list(SELECTABLE)),
+        check("response order, duplicates dropped",
+              select_charts(['place_ratings', 'brand_popularity', 'place_ratings']), ['brand_popularity', 'place_ratings']),
+        check("comma-separated string", select_charts(' brand_trend_analysis, ,top_rated_places '),
+              ['brand_trend_analysis', 'top_rated_places']),
+        check("empty list rejected", rejects([]), "charts must be a non-empty list of chart keys"),
+        check("blank string rejected", rejects(' , '), "charts must be a non-empty list of chart keys"),
+        check("non-list rejected", rejects({'brand_popularity': True}), "charts must be a non-empty list of chart keys"),
+        check("unknown key named", (rejects(['brand_popularity', 'nope']) or '').startswith("Unknown chart(s): nope."), True),
+    ])
+
+
+def test_entity_types_for():
+    print("🧪 Testing entity_types_for...")
+    return all([
+        check("brands only", entity_types_for(['brand_popularity', 'brand_trend_analysis']), {'brands'}),
+        check("places only", entity_types_for(['top_rated_places', 'place_ratings']), {'places'}),
+        check("everything", entity_types_for(select_charts()), {'brands', 'places'}),
+    ])
+
+
+def test_rejected_requests():
+    print("🧪 Testing rejected charts= requests...")
+
+    def no_fetch(*args, **kwargs):
+        raise AssertionError("a rejected selection must not reach Qloo")
+
+    city_context.fetch_brands_and_places = no_fetch
+    with app.test_client() as client:
+        post_unknown = client.post('/api/visualizations', json={'city': 'Testville', 'charts': ['nope']})
+        post_empty = client.post('/api/visualizations', json={'city': 'Testville', 'charts': []})
+        get_unknown = client.get('/api/visualizations?city=Testville&charts=brand_popularity,nope')
+        return all([
+            check("POST unknown chart", post_unknown.status_code, 400),
+            check("POST error names the chart", 'nope' in post_unknown.get_json()['error'], True),
+            check("POST empty selection", post_empty.status_code, 400),
+            check("GET unknown chart", get_unknown.status_code, 400),
+        ])
+
+
+def test_figure_cache():
+    print("🧪 Testing the figure cache...")
+    charts = ['brand_popularity', 'place_ratings', 'place_categories']
+
+    def render(data, city='Testville'):
+        visualizer = QlooVisualizer()
+        visualizer.set_data(data, data)
+        return visualizer.generate_all_visualizations(city, 'GB', compact=True, parallel=False, charts=charts)
+
+    figure_cache.clear()
+    first = render(make_data())
+    before = figure_cache.stats()
+    second = render(make_data())
+    after = figure_cache.stats()
+    results = [
+        check("charts built", sorted(key for key in first if key in charts), sorted(charts)),
+        check("repeat served from the cache", (after['hits'] - before['hits'], after['entries']), (3, 3)),
+        check("cached charts unchanged", second, first),
+    ]
+    render(make_data(shift=0.5))
+    results.append(check("changed data is a miss", figure_cache.stats()['entries'], 6))
+    render(make_data(), city='Otherville')
+    results.append(check("another city is a miss", figure_cache.stats()['entries'], 9))
+    return all(results)
+
+
+if __name__ == '__main__':
+    tests = [test_select_charts, test_entity_types_for, test_rejected_requests, test_figure_cache]
+    success = all([test() for test in tests])
+    sys.exit(0 if success else 1)
@@ -1,18 +1,256 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
+import hashlib
+import importlib
 import json
+import logging
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
 import time
-import random
-from collections import Counter
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
-from qloo_analysis import get_brands, get_places, format_brands_output, get_formatted_place_data
+from cache import TTLCache
+from city_context import DEFAULT_LIMIT, get_city_context
+from city_dataset import CityDataset, most_common, DINING, FOOD, RETAIL, OFFICE, HOTEL, OUTDOOR, LUXURY
+from log_config import SAMPLED, configure_logging
+import metrics
+from qloo_analysis import get_brands
 
-# Set style for better-looking plots
-plt.style.use('seaborn-v0_8')
-sns.set_palette("husl")
+logger = logging.getLogger(__name__)
+
+class _LazyModule:
+    """Import a module on first attribute access instead of at import time"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+# plotly and pandas are only needed once a chart is built, so they stay out of
+# the app's import path (cold start and per-worker RSS)
+go = _LazyModule('plotly.graph_objects')
+pd = _LazyModule('pandas')
+pio = _LazyModule('plotly.io')
+
+# --- Chart Generation Configuration ---
+# Worker processes for building charts in parallel; 0 builds them in-process, one after another
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', '0'))
+# Seconds a parallel build waits for its charts; charts still running are left out of the response
+CHART_TIMEOUT = float(os.getenv('CHART_TIMEOUT', '10'))
+# Rendered-figure cache: how long serialized charts are reused, and its memory budget
+FIGURE_CACHE_TTL = float(os.getenv('FIGURE_CACHE_TTL', '3600'))
+FIGURE_CACHE_MAX_BYTES = int(os.getenv('FIGURE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+# Bump whenever a chart's code or styling changes so cached figures are not served stale
+STYLE_VERSION = "4"
+# HTTP caching of GET /api/visualizations: fresh for max-age, then served stale while revalidating
+VIZ_MAX_AGE = int(os.getenv('VIZ_MAX_AGE', '300'))
+VIZ_STALE_WHILE_REVALIDATE = int(os.getenv('VIZ_STALE_WHILE_REVALIDATE', '3600'))
+VIZ_CACHE_CONTROL = f"public, max-age={VIZ_MAX_AGE}, stale-while-revalidate={VIZ_STALE_WHILE_REVALIDATE}"
+
+# Chart registry: response key -> (QlooVisualizer method, entity list it reads), in response order
+CHARTS = OrderedDict([
+    ('brand_popularity', ('create_brand_popularity_chart', 'brands')),
+    ('brand_categories', ('create_brand_categories_pie', 'brands')),
+    ('place_ratings', ('create_place_ratings_distribution', 'places')),
+    ('place_categories', ('create_place_categories_chart', 'places')),
+    ('business_density', ('create_business_density_analysis', 'places')),
+    ('business_hours', ('create_business_hours_analysis', 'places')),
+    ('price_range', ('create_price_range_analysis', 'places')),
+    ('keyword_word_cloud', ('create_keyword_word_cloud', 'places')),
+    ('brand_trend_analysis', ('create_brand_trend_analysis', 'brands')),
+    ('geographic_distribution', ('create_geographic_distribution', 'places')),
+    ('competition_analysis', ('create_competition_analysis', 'places')),
+    ('seasonal_analysis', ('create_seasonal_analysis', 'places')),
+])
+
+# Serialized figures keyed by dataset fingerprint, city, chart key and style version
+figure_cache = TTLCache(max_bytes=FIGURE_CACHE_MAX_BYTES, ttl=FIGURE_CACHE_TTL, name="figures")
+metrics.register_cache(figure_cache)
+
+def chart_rng(city_name, country_code, chart):
+    """
+    Private random generator for the charts that simulate data.
+
+    Seeded from a blake2b digest of city, country and chart name, so a chart
+    draws the same numbers in every process and thread (unlike hash(), which
+    is randomized per interpreter) and never touches the global RNG state.
+    """
+    digest = hashlib.blake2b(f"{city_name}|{country_code}|{chart}".encode('utf-8'), digest_size=8)
+    return np.random.default_rng(int.from_bytes(digest.digest(), 'little'))
+
+def figure_cache_key(dataset, key, city_name, country_code, compact):
+    """Cache key for one serialized chart (titles include the city, so it is part of the key)"""
+    return f"{STYLE_VERSION}|{dataset.fingerprint}|{key}|{city_name}|{country_code}|{int(bool(compact))}"
+
+def figure_cache_stats():
+    return figure_cache.stats()
+
+# Everything a client can ask for with charts=: the registered charts plus the
+# top-rated places list, mapped to the entity list each reads
+SELECTABLE = OrderedDict([(key, kind) for key, (_, kind) in CHARTS.items()] + [('top_rated_places', 'places')])
+
+def select_charts(charts=None):
+    """
+    Validate a charts= selection and return it in response order.
+
+    Accepts a list of keys or a comma-separated string; None selects
+    everything. Raises ValueError for an empty selection or unknown keys.
+    """
+    if charts is None:
+        return list(SELECTABLE)
+    if isinstance(charts, str):
+        charts = [key.strip() for key in charts.split(',') if key.strip()]
+    if not isinstance(charts, (list, tuple)) or not charts:
+        raise ValueError("charts must be a non-empty list of chart keys")
+    unknown = [key for key in charts if key not in SELECTABLE]
+    if unknown:
+        raise ValueError(f"Unknown chart(s): {', '.join(map(str, unknown))}. Available: {', '.join(SELECTABLE)}")
+    return [key for key in SELECTABLE if key in charts]
+
+def entity_types_for(charts):
+    """The entity lists ('brands', 'places') the selected keys read"""
+    return {SELECTABLE[key] for key in charts}
+
+_template_json = None
+
+def default_template_json():
+    """The default plotly template as JSON, serialized once per process"""
+    global _template_json
+    if _template_json is None:
+        template = pio.templates[pio.templates.default]
+        _template_json = pio.json.to_json_plotly(template.to_plotly_json())
+    return _template_json
+
+def splice_visualizations_json(visualizations):
+    """
+    Encode generate_all_visualizations() output as a version 2 response body.
+
+    Version 1 responses (plain jsonify) carry every chart as a JSON string
+    inside the JSON document, so each figure is encoded twice and its quotes
+    escaped. Every value here is already a JSON document, so version 2
+    splices them in as nested objects without decoding or re-encoding them.
+    """
+    parts = [f'{json.dumps(key)}:{value}' for key, value in visualizations.items()]
+    parts.append('"version":2')
+    return '{' + ','.join(parts) + '}'
+
+def visualization_query(args):
+    """
+    Read GET /api/visualizations query parameters into the POST body fields.
+
+    ?city=&country=&limit=&charts=a,b&compact=1&version=2; raises ValueError
+    for a missing city or a non-integer limit.
+    """
+    if not args.get('city'):
+        raise ValueError("city is required")
+    try:
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    return {
+        'city': args.get('city'),
+        'country': args.get('country'),
+        'limit': limit,
+        'charts': args.get('charts'),
+        'compact': args.get('compact', '').lower() in ('1', 'true', 'yes'),
+        'version': 2 if args.get('version') == '2' else 1,
+    }
+
+def visualizations_etag(dataset, city_name, country_code, limit, charts, compact, version):
+    """
+    Strong ETag for a visualizations response.
+
+    Charts are deterministic given the data (see chart_rng), so the dataset
+    fingerprint plus the request parameters and STYLE_VERSION pin down the
+    exact response bytes; it can be computed before any chart is built.
+    """
+    key = f"{STYLE_VERSION}|{dataset.fingerprint}|{city_name}|{country_code}|{limit}|{','.join(charts)}|{int(bool(compact))}|{version}"
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+class VisualizationsGet:
+    """
+    GET /api/visualizations, shared by the Flask and Quart apps.
+
+    Each app parses the query (ValueError means 400), fetches the entity
+    lists in fetch from context with its own client, and hands them to
+    response(). Only complete responses (every needed Qloo list fetched,
+    no chart failed or timed out) carry the ETag and public Cache-Control;
+    anything else is sent as no-store without validators, so a partial
+    dashboard is never cached or revalidated.
+
+    The ETag is always weak: the bytes differ by Content-Encoding, and the
+    200 and 304 must agree whichever coding the client negotiates. There
+    is no Last-Modified, as each worker fetches from Qloo at its own time
+    and would give the same document a different date.
+    """
+
+    def __init__(self, args):
+        self.query = visualization_query(args)
+        self.charts = select_charts(self.query['charts'])
+        self.city, self.country, self.limit = self.query['city'], self.query['country'], self.query['limit']
+        entity_types = entity_types_for(self.charts)
+        # Keyword arguments for context.get_entities/async_get_entities
+        self.fetch = {'brands': 'brands' in entity_types, 'places': 'places' in entity_types}
+        self.context = get_city_context(self.city, self.country)
+        logger.info("🔍 NEW GET REQUEST - City: %s, Country: %s, Limit: %s", self.city, self.country, self.limit)
+
+    def _validators(self, etag):
+        return {'ETag': f'W/"{etag}"', 'Cache-Control': VIZ_CACHE_CONTROL}
+
+    def response(self, req, raw_brands, raw_places):
+        """
+        Return (status, body, headers) for the fetched entities.
+
+        A 304 with the validators when req's cached copy is current,
+        otherwise the charts encoded as the requested version. Blocking;
+        the async app runs it in a worker thread.
+        """
+        from http_utils import is_not_modified
+
+        visualizer = QlooVisualizer()
+        visualizer.set_data(raw_brands, raw_places)
+
+        # A failed Qloo call is retried on the next request, so that response gets no validators
+        complete = not ((self.fetch['brands'] and raw_brands is None) or (self.fetch['places'] and raw_places is None))
+        if complete:
+            etag = visualizations_etag(
+                visualizer.dataset, self.city, self.country, self.limit, self.charts,
+                self.query['compact'], self.query['version']
+            )
+            if is_not_modified(req, etag):
+                logger.info("♻️ Not modified for %s, %s", self.city, self.country)
+                return 304, '', self._validators(etag)
+
+        viz_data = visualizer.generate_all_visualizations(
+            self.city, self.country, self.limit, compact=self.query['compact'], charts=self.charts
+        )
+        logger.info("📈 Generated visualizations for %s, %s: %s", self.city, self.country, list(viz_data.keys()))
+
+        body = splice_visualizations_json(viz_data) if self.query['version'] == 2 else json.dumps(viz_data)
+        if visualizer.failed_charts:
+            logger.warning("⚠️ Not caching %s, %s: %s failed", self.city, self.country, ', '.join(visualizer.failed_charts))
+        if not complete or visualizer.failed_charts:
+            return 200, body, {'Cache-Control': 'no-store'}
+        return 200, body, self._validators(etag)
+
+def compact_figure_json(fig):
+    """
+    Serialize a figure without its layout.template (the template is removed from fig).
+
+    The charts never set a template, so every figure would otherwise embed a
+    copy of the ~10 KB default one; compact responses send it once instead
+    (see generate_all_visualizations). Dropping it before serializing also
+    spares plotly from deep-copying and encoding it. plotly's JSON engine
+    uses orjson when it is installed.
+    """
+    fig.layout.template = None
+    return fig.to_json()
 
 class QlooVisualizer:
     def __init__(self):
@@ -22,84 +260,72 @@ class QlooVisualizer:
         self.gradient_colors = ['#667eea', '#764ba2', '#f093fb', '#f5576c', '#4facfe', '#00f2fe']
         self.pastel_colors = ['#FFB3BA', '#BAFFC9', '#BAE1FF', '#FFFFBA', '#FFB3F7', '#B3FFB3']
         
-        # Store pre-fetched data
+        # Store pre-fetched data and its columnar form (see city_dataset.py)
         self.brands_data = None
         self.places_data = None
+        self.dataset = CityDataset(None, None)
+        # Charts the last generate_all_visualizations() left out because they raised or timed out
+        self.failed_charts = []
     
     def set_data(self, brands_data, places_data):
         """Set the pre-fetched data for visualization"""
         self.brands_data = brands_data
         self.places_data = places_data
-        
-        # Debug: Check what data we're setting
-        brands_count = len(brands_data.get('results', {}).get('entities', [])) if brands_data else 0
-        places_count = len(places_data.get('results', {}).get('entities', [])) if places_data else 0
+        # Normalize both entity lists once; every chart reads these columns
+        self.dataset = CityDataset(brands_data, places_data)
+        brands, places = self.dataset.brands, self.dataset.places
         
         # Show first few items to verify data
-        if brands_data and 'results' in brands_data and 'entities' in brands_data['results']:
-            first_brands = [brand.get('name', 'Unknown') for brand in brands_data['results']['entities'][:3]]
-            print(f"[Visualizer] 📊 Set brands data: {brands_count} brands, first 3: {first_brands}")
+        if brands is not None:
+            logger.debug("📊 Set brands data: %s brands, first 3: %s", brands.size, brands.names[:3], extra=SAMPLED)
         else:
-            print(f"[Visualizer] ⚠️ Set brands data: {brands_count} brands (no valid data)")
+            logger.debug("Set brands data: 0 brands (no valid data)", extra=SAMPLED)
             
-        if places_data and 'results' in places_data and 'entities' in places_data['results']:
-            first_places = [place.get('name', 'Unknown') for place in places_data['results']['entities'][:3]]
-            print(f"[Visualizer] 🏢 Set places data: {places_count} places, first 3: {first_places}")
+        if places is not None:
+            logger.debug("🏢 Set places data: %s places, first 3: %s", places.size, places.names[:3], extra=SAMPLED)
         else:
-            print(f"[Visualizer] ⚠️ Set places data: {places_count} places (no valid data)")
+            logger.debug("Set places data: 0 places (no valid data)", extra=SAMPLED)
     
     def get_top_rated_places(self, limit=5):
         """Extract and sort the top N places by rating."""
-        print(f"[Visualizer]  extracting top {limit} rated places")
-        if not self.places_data or 'results' not in self.places_data or 'entities' not in self.places_data['results']:
+        logger.debug("Extracting top %s rated places", limit, extra=SAMPLED)
+        places = self.dataset.places
+        if places is None:
             return []
 
-        places_with_ratings = []
-        for place in self.places_data['results']['entities']:
-            properties = place.get('properties', {})
-            rating = properties.get('business_rating')
-            if rating and rating != 'N/A':
-                try:
-                    places_with_ratings.append({
-                        'name': place.get('name', 'Unknown'),
-                        'rating': float(rating),
-                        'category': place.get('tags', [{}])[0].get('name', 'General')
-                    })
-                except (ValueError, TypeError, IndexError):
-                    continue
-        
-        # Sort by rating descending and return top N
-        sorted_places = sorted(places_with_ratings, key=lambda p: p['rating'], reverse=True)
-        return sorted_places[:limit]
-
-    def create_keyword_word_cloud(self, city_name):
+        # Sort rated places by rating descending (ties keep API order) and return top N;
+        # a zero rating counts as unrated in this list, and places with an empty tags list are left out
+        rated = np.flatnonzero(~np.isnan(places.rating) & (places.rating != 0) & ~places.empty_tags)
+        top = rated[np.argsort(-places.rating[rated], kind='stable')][:limit]
+        categories = places.category_names('General')
+        return [
+            {'name': places.names[i], 'rating': float(places.rating[i]), 'category': categories[i]}
+            for i in top
+        ]
+
+    def create_keyword_word_cloud(self, city_name, country_code=None, limit=50):
         """Create a word cloud from place tags and keywords."""
-        print(f"[Visualizer] 🎨 Creating keyword word cloud for {city_name}")
-        if not self.places_data or 'results' not in self.places_data or 'entities' not in self.places_data['results']:
-            print(f"[Visualizer] ❌ No valid places data for word cloud in {city_name}")
+        logger.debug("🎨 Creating keyword word cloud for %s", city_name, extra=SAMPLED)
+        places = self.dataset.places
+        if places is None:
+            logger.debug("No valid places data for word cloud in %s", city_name, extra=SAMPLED)
             return None
 
-        words = []
-        for place in self.places_data['results']['entities']:
-            tags = place.get('tags', [])
-            words.extend([tag.get('name') for tag in tags if tag.get('name')])
-            
-            properties = place.get('properties', {})
-            keywords = properties.get('keywords', [])
-            words.extend([kw.get('name') for kw in keywords if kw.get('name')])
+        word_counts = Counter(dict(most_common(places.tag_counts(), places.tag_vocab.names)))
+        word_counts.update(dict(most_common(places.keyword_counts(), places.keyword_vocab.names)))
 
-        if not words:
+        if not word_counts:
             return None
 
-        word_counts = Counter(words)
         top_words = dict(word_counts.most_common(40))
 
-        # Generate random colors for the words
-        colors = [f'hsl({np.random.randint(0, 360)}, 70%, 50%)' for _ in range(len(top_words))]
+        # Random colors and positions for the words, stable per city
+        rng = chart_rng(city_name, country_code, 'word_cloud')
+        colors = [f'hsl({hue}, 70%, 50%)' for hue in rng.integers(0, 360, len(top_words))]
 
         fig = go.Figure(go.Scatter(
-            x=np.random.rand(len(top_words)),
-            y=np.random.rand(len(top_words)),
+            x=rng.random(len(top_words)),
+            y=rng.random(len(top_words)),
             mode='text',
             text=list(top_words.keys()),
             textfont=dict(
@@ -123,22 +349,17 @@ class QlooVisualizer:
 
     def create_brand_popularity_chart(self, city_name, country_code, limit=50):
         """Create a beautiful bar chart showing brand popularity for a city"""
-        print(f"[Visualizer] 🎨 Creating brand popularity chart for {city_name}, {country_code}")
+        logger.debug("🎨 Creating brand popularity chart for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.brands_data or 'results' not in self.brands_data or 'entities' not in self.brands_data['results']:
-            print(f"[Visualizer] ❌ No valid brands data for {city_name}")
+        table = self.dataset.brands
+        if table is None:
+            logger.debug("No valid brands data for %s", city_name, extra=SAMPLED)
             return None
         
-        brands = []
-        popularities = []
-        
-        for brand in self.brands_data['results']['entities']:
-            name = brand.get('name', 'Unknown')
-            popularity = brand.get('popularity', 0) * 100  # Convert to percentage
-            brands.append(name)
-            popularities.append(popularity)
+        brands = table.names
+        popularities = table.popularity * 100  # Convert to percentage
         
-        print(f"[Visualizer] ✅ Processed {len(brands)} brands for {city_name}: {brands[:3]}...")  # Show first 3 brands
+        logger.debug("✅ Processed %s brands for %s: %s...", len(brands), city_name, brands[:3], extra=SAMPLED)
         
         # Create DataFrame
         df = pd.DataFrame({
@@ -198,28 +419,20 @@ class QlooVisualizer:
     
     def create_brand_categories_pie(self, city_name, country_code, limit=50):
         """Create a beautiful pie chart showing brand categories/tags distribution"""
-        print(f"[Visualizer] Creating brand categories pie chart for {city_name}, {country_code}")
+        logger.debug("Creating brand categories pie chart for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.brands_data or 'results' not in self.brands_data or 'entities' not in self.brands_data['results']:
-            print(f"[Visualizer] No valid brands data for categories in {city_name}")
+        brands = self.dataset.brands
+        if brands is None:
+            logger.debug("No valid brands data for categories in %s", city_name, extra=SAMPLED)
             return None
         
-        all_tags = []
-        for brand in self.brands_data['results']['entities']:
-            tags = brand.get('tags', [])
-            for tag in tags:
-                tag_name = tag.get('name', 'Unknown')
-                if tag_name:
-                    all_tags.append(tag_name)
-        
-        print(f"[Visualizer] Found {len(all_tags)} total tags for {city_name}")
-        
-        # Count tag frequencies
-        tag_counts = Counter(all_tags)
+        # Tags without a name count as "Unknown" here
+        tag_counts = brands.label_counts()
+        logger.debug("Found %s total tags for %s", int(tag_counts.sum()), city_name, extra=SAMPLED)
         
         # Get top 8 tags
-        top_tags = dict(tag_counts.most_common(8))
-        print(f"[Visualizer] Top tags for {city_name}: {list(top_tags.keys())}")
+        top_tags = dict(most_common(tag_counts, brands.label_vocab.names, 8))
+        logger.debug("Top tags for %s: %s", city_name, list(top_tags.keys()), extra=SAMPLED)
         
         # Create beautiful pie chart
         fig = go.Figure()
@@ -265,40 +478,39 @@ class QlooVisualizer:
 
     def create_place_ratings_distribution(self, city_name, country_code, limit=50):
         """Create a beautiful histogram showing distribution of place ratings"""
-        print(f"[Visualizer] Creating place ratings distribution for {city_name}, {country_code}")
+        logger.debug("Creating place ratings distribution for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.places_data or 'results' not in self.places_data or 'entities' not in self.places_data['results']:
-            print(f"[Visualizer] No valid places data for ratings in {city_name}")
+        places = self.dataset.places
+        if places is None:
+            logger.debug("No valid places data for ratings in %s", city_name, extra=SAMPLED)
             return None
         
-        ratings = []
-        for place in self.places_data['results']['entities']:
-            properties = place.get('properties', {})
-            rating = properties.get('business_rating')
-            if rating and rating != 'N/A':
-                try:
-                    ratings.append(float(rating))
-                except (ValueError, TypeError):
-                    continue
-        
-        if not ratings:
-            print(f"[Visualizer] No valid ratings found for {city_name}")
+        # Zero ratings are left out of the histogram, as in the top-rated list
+        ratings = places.rating[~np.isnan(places.rating) & (places.rating != 0)]
+        
+        if not len(ratings):
+            logger.debug("No valid ratings found for %s", city_name, extra=SAMPLED)
             return None
         
-        print(f"[Visualizer] Found {len(ratings)} valid ratings for {city_name}")
+        logger.debug("Found %s valid ratings for %s", len(ratings), city_name, extra=SAMPLED)
+        
+        # Bin on the server so the figure carries 10 bars instead of every rating
+        counts, edges = np.histogram(ratings, bins=10)
         
         # Create beautiful histogram
         fig = go.Figure()
         
-        fig.add_trace(go.Histogram(
-            x=ratings,
-            nbinsx=10,
+        fig.add_trace(go.Bar(
+            x=((edges[:-1] + edges[1:]) / 2).tolist(),
+            y=counts.tolist(),
+            width=float(edges[1] - edges[0]) or None,
+            customdata=[f'{lo:.2f} - {hi:.2f}' for lo, hi in zip(edges[:-1], edges[1:])],
             marker=dict(
                 color='#4ECDC4',
                 line=dict(color='white', width=1)
             ),
             opacity=0.8,
-            hovertemplate='<b>Rating Range</b><br>Count: %{y}<br>Rating: %{x}<extra></extra>'
+            hovertemplate='<b>Rating Range</b><br>Count: %{y}<br>Rating: %{customdata}<extra></extra>'
         ))
         
         fig.update_layout(
@@ -329,28 +541,20 @@ class QlooVisualizer:
 
     def create_place_categories_chart(self, city_name, country_code, limit=50):
         """Create a beautiful bar chart showing place categories/tags"""
-        print(f"[Visualizer] Creating place categories chart for {city_name}, {country_code}")
+        logger.debug("Creating place categories chart for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.places_data or 'results' not in self.places_data or 'entities' not in self.places_data['results']:
-            print(f"[Visualizer] No valid places data for categories in {city_name}")
+        places = self.dataset.places
+        if places is None:
+            logger.debug("No valid places data for categories in %s", city_name, extra=SAMPLED)
             return None
         
-        all_tags = []
-        for place in self.places_data['results']['entities']:
-            tags = place.get('tags', [])
-            for tag in tags:
-                tag_name = tag.get('name', 'Unknown')
-                if tag_name:
-                    all_tags.append(tag_name)
-        
-        print(f"[Visualizer] Found {len(all_tags)} total tags for {city_name}")
-        
-        # Count tag frequencies
-        tag_counts = Counter(all_tags)
+        # Tags without a name count as "Unknown" here
+        tag_counts = places.label_counts()
+        logger.debug("Found %s total tags for %s", int(tag_counts.sum()), city_name, extra=SAMPLED)
         
         # Get top 12 tags
-        top_tags = dict(tag_counts.most_common(12))
-        print(f"[Visualizer] Top tags for {city_name}: {list(top_tags.keys())}")
+        top_tags = dict(most_common(tag_counts, places.label_vocab.names, 12))
+        logger.debug("Top tags for %s: %s", city_name, list(top_tags.keys()), extra=SAMPLED)
         
         # Create DataFrame
         df = pd.DataFrame({
@@ -410,54 +614,29 @@ class QlooVisualizer:
 
     def create_business_density_analysis(self, city_name, country_code, limit=50):
         """Create a scatter plot showing business density and quality analysis"""
-        print(f"[Visualizer] Creating business density analysis for {city_name}, {country_code}")
+        logger.debug("Creating business density analysis for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.places_data or 'results' not in self.places_data or 'entities' not in self.places_data['results']:
-            print(f"[Visualizer] No valid places data for density analysis in {city_name}")
+        places = self.dataset.places
+        if places is None:
+            logger.debug("No valid places data for density analysis in %s", city_name, extra=SAMPLED)
             return None
         
-        # Extract business data
-        business_data = []
-        for place in self.places_data['results']['entities']:
-            properties = place.get('properties', {})
-            name = place.get('name', 'Unknown')
-            rating = properties.get('business_rating', 'N/A')
-            address = properties.get('address', 'N/A')
-            
-            # Try to extract rating as float
-            try:
-                rating_float = float(rating) if rating != 'N/A' else None
-            except (ValueError, TypeError):
-                rating_float = None
-            
-            # Extract tags for categorization
-            tags = place.get('tags', [])
-            tag_names = [tag.get('name', '') for tag in tags if tag.get('name')]
-            
-            business_data.append({
-                'name': name,
-                'rating': rating_float,
-                'address': address,
-                'tags': tag_names,
-                'tag_count': len(tag_names)
-            })
-        
-        # Filter out places without ratings
-        valid_businesses = [b for b in business_data if b['rating'] is not None]
+        # Only places with a rating are plotted
+        valid = np.flatnonzero(~np.isnan(places.rating))
         
-        if len(valid_businesses) < 5:
-            print(f"[Visualizer] Not enough valid businesses with ratings for {city_name}")
+        if len(valid) < 5:
+            logger.debug("Not enough valid businesses with ratings for %s", city_name, extra=SAMPLED)
             return None
         
-        print(f"[Visualizer] Found {len(valid_businesses)} businesses with valid ratings for {city_name}")
+        logger.debug("Found %s businesses with valid ratings for %s", len(valid), city_name, extra=SAMPLED)
         
         # Create scatter plot
         fig = go.Figure()
         
         # Group by tag count for different colors
-        tag_counts = [b['tag_count'] for b in valid_businesses]
-        ratings = [b['rating'] for b in valid_businesses]
-        names = [b['name'] for b in valid_businesses]
+        tag_counts = places.tags_per_entity()[valid].tolist()
+        ratings = places.rating[valid].tolist()
+        names = [places.names[i] for i in valid]
         
         fig.add_trace(go.Scatter(
             x=tag_counts,
@@ -502,47 +681,41 @@ class QlooVisualizer:
 
     def create_business_hours_analysis(self, city_name, country_code, limit=50):
         """Create a heatmap showing business activity patterns"""
-        print(f"[Visualizer] Creating business hours analysis for {city_name}, {country_code}")
+        logger.debug("Creating business hours analysis for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.places_data or 'results' not in self.places_data or 'entities' not in self.places_data['results']:
-            print(f"[Visualizer] No valid places data for hours analysis in {city_name}")
+        places = self.dataset.places
+        if places is None:
+            logger.debug("No valid places data for hours analysis in %s", city_name, extra=SAMPLED)
             return None
         
         # Simulate business hours data (since Qloo API doesn't provide this)
         # In a real implementation, you'd extract this from the API response
-        hours_data = []
-        for place in self.places_data['results']['entities']:
-            properties = place.get('properties', {})
-            # Simulate business hours based on place type
-            tags = place.get('tags', [])
-            tag_names = [tag.get('name', '').lower() for tag in tags]
-            
-            # Assign typical hours based on business type
-            if any(word in ' '.join(tag_names) for word in ['restaurant', 'cafe', 'bar', 'food']):
-                # Food establishments: 6 AM - 11 PM
-                hours = list(range(6, 23))
-            elif any(word in ' '.join(tag_names) for word in ['shop', 'store', 'retail']):
-                # Retail: 9 AM - 8 PM
-                hours = list(range(9, 20))
-            elif any(word in ' '.join(tag_names) for word in ['office', 'business', 'professional']):
-                # Offices: 8 AM - 6 PM
-                hours = list(range(8, 18))
-            else:
-                # Default: 9 AM - 6 PM
-                hours = list(range(9, 18))
-            
-            hours_data.extend(hours)
-        
-        if not hours_data:
-            print(f"[Visualizer] No hours data generated for {city_name}")
+        if places.size == 0:
+            logger.debug("No hours data generated for %s", city_name, extra=SAMPLED)
             return None
         
+        # Assign typical opening hours based on business type, first match wins:
+        # food 6 AM - 11 PM, retail 9 AM - 8 PM, offices 8 AM - 6 PM, default 9 AM - 6 PM
+        opening_hours = [(6, 23), (9, 20), (8, 18), (9, 18)]
+        business_type = np.select(
+            [
+                places.has_class(DINING | FOOD),
+                places.has_class(RETAIL),
+                places.has_class(OFFICE),
+            ],
+            [0, 1, 2],
+            default=3
+        )
+        places_per_type = np.bincount(business_type, minlength=len(opening_hours))
+        
         # Count business activity by hour
-        hour_counts = Counter(hours_data)
+        hour_counts = np.zeros(24, dtype=np.int64)
+        for (open_hour, close_hour), count in zip(opening_hours, places_per_type):
+            hour_counts[open_hour:close_hour] += count
         
         # Create heatmap data
         hours = list(range(24))
-        counts = [hour_counts.get(hour, 0) for hour in hours]
+        counts = hour_counts.tolist()
         
         # Create bar chart (heatmap alternative)
         fig = go.Figure()
@@ -590,51 +763,36 @@ class QlooVisualizer:
 
     def create_price_range_analysis(self, city_name, country_code, limit=50):
         """Create a chart showing price range distribution"""
-        print(f"[Visualizer] Creating price range analysis for {city_name}, {country_code}")
+        logger.debug("Creating price range analysis for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.places_data or 'results' not in self.places_data or 'entities' not in self.places_data['results']:
-            print(f"[Visualizer] No valid places data for price analysis in {city_name}")
+        places = self.dataset.places
+        if places is None:
+            logger.debug("No valid places data for price analysis in %s", city_name, extra=SAMPLED)
             return None
         
-        # Simulate price ranges based on business type and rating
-        price_data = []
-        for place in self.places_data['results']['entities']:
-            properties = place.get('properties', {})
-            rating = properties.get('business_rating', 'N/A')
-            tags = place.get('tags', [])
-            tag_names = [tag.get('name', '').lower() for tag in tags]
-            
-            # Assign price range based on business type and rating
-            try:
-                rating_float = float(rating) if rating != 'N/A' else 3.0
-            except (ValueError, TypeError):
-                rating_float = 3.0
-            
-            # Base price on business type
-            if any(word in ' '.join(tag_names) for word in ['luxury', 'premium', 'high-end']):
-                base_price = 4
-            elif any(word in ' '.join(tag_names) for word in ['restaurant', 'cafe', 'bar']):
-                base_price = 3
-            elif any(word in ' '.join(tag_names) for word in ['shop', 'store', 'retail']):
-                base_price = 2
-            else:
-                base_price = 2
-            
-            # Adjust based on rating
-            price_level = min(5, max(1, base_price + (rating_float - 3.0) * 0.5))
-            price_data.append(price_level)
+        # Simulate price ranges based on business type and rating (unrated places count as 3.0)
+        rating = np.where(np.isnan(places.rating), 3.0, places.rating)
+        
+        # Base price on business type: luxury 4, food & drink 3, everything else 2
+        base_price = np.select(
+            [
+                places.has_class(LUXURY),
+                places.has_class(DINING),
+            ],
+            [4, 3],
+            default=2
+        )
         
-        if not price_data:
-            print(f"[Visualizer] No price data generated for {city_name}")
+        # Adjust based on rating
+        price_data = np.clip(base_price + (rating - 3.0) * 0.5, 1, 5)
+        
+        if not len(price_data):
+            logger.debug("No price data generated for %s", city_name, extra=SAMPLED)
             return None
         
-        # Create price range categories
-        price_ranges = {
-            'Budget ($)': len([p for p in price_data if p <= 2]),
-            'Moderate ($$)': len([p for p in price_data if 2 < p <= 3.5]),
-            'Premium ($$$)': len([p for p in price_data if 3.5 < p <= 4.5]),
-            'Luxury ($$$$)': len([p for p in price_data if p > 4.5])
-        }
+        # Bucket price levels: <= 2, (2, 3.5], (3.5, 4.5], > 4.5
+        buckets = np.bincount(np.digitize(price_data, [2, 3.5, 4.5], right=True), minlength=4)
+        price_ranges = dict(zip(['Budget ($)', 'Moderate ($$)', 'Premium ($$$)', 'Luxury ($$$$)'], buckets.tolist()))
         
         # Create pie chart
         fig = go.Figure()
@@ -680,50 +838,35 @@ class QlooVisualizer:
 
     def create_brand_trend_analysis(self, city_name, country_code, limit=50):
         """Create a trend analysis chart showing brand popularity trends"""
-        print(f"[Visualizer] Creating brand trend analysis for {city_name}, {country_code}")
+        logger.debug("Creating brand trend analysis for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.brands_data or 'results' not in self.brands_data or 'entities' not in self.brands_data['results']:
-            print(f"[Visualizer] No valid brands data for trend analysis in {city_name}")
+        brands = self.dataset.brands
+        if brands is None:
+            logger.debug("No valid brands data for trend analysis in %s", city_name, extra=SAMPLED)
             return None
         
-        entities = self.brands_data['results']['entities']
-        print(f"[Visualizer] Processing {len(entities)} brand entities for trend analysis")
-        
-        brands = []
-        popularities = []
-        categories = []
-        
-        for brand in self.brands_data['results']['entities']:
-            name = brand.get('name', 'Unknown')
-            popularity = brand.get('popularity', 0) * 100
-            tags = brand.get('tags', [])
-            # Safely get category - handle empty tags list
-            category = 'Other'
-            if tags and len(tags) > 0:
-                category = tags[0].get('name', 'Other')
-            
-            brands.append(name)
-            popularities.append(popularity)
-            categories.append(category)
+        logger.debug("Processing %s brand entities for trend analysis", brands.size, extra=SAMPLED)
+        
+        popularities = brands.popularity * 100
         
         # Create trend analysis with category grouping
         fig = go.Figure()
         
-        # Group by category
+        # Group by category (the brand's first tag), in first-seen order
         category_data = {}
-        for i, category in enumerate(categories):
-            if i < len(brands) and i < len(popularities):  # Safety check
-                if category not in category_data:
-                    category_data[category] = {'names': [], 'popularities': []}
-                category_data[category]['names'].append(brands[i])
-                category_data[category]['popularities'].append(popularities[i])
+        for code, members in brands.category_groups():
+            category = brands.category_vocab.names[code] if code >= 0 else 'Other'
+            category_data[category] = {
+                'names': [brands.names[i] for i in members],
+                'popularities': popularities[members].tolist()
+            }
         
         # Check if we have enough data
         if not category_data:
-            print(f"[Visualizer] No valid category data for trend analysis in {city_name}")
+            logger.debug("No valid category data for trend analysis in %s", city_name, extra=SAMPLED)
             return None
         
-        print(f"[Visualizer] Created trend analysis with {len(category_data)} categories")
+        logger.debug("Created trend analysis with %s categories", len(category_data), extra=SAMPLED)
         
         # Add traces for each category
         for category, data in category_data.items():
@@ -773,35 +916,27 @@ class QlooVisualizer:
 
     def create_geographic_distribution(self, city_name, country_code, limit=50):
         """Create a geographic distribution chart showing business spread"""
-        print(f"[Visualizer] Creating geographic distribution for {city_name}, {country_code}")
+        logger.debug("Creating geographic distribution for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.places_data or 'results' not in self.places_data or 'entities' not in self.places_data['results']:
-            print(f"[Visualizer] No valid places data for geographic distribution in {city_name}")
+        table = self.dataset.places
+        if table is None:
+            logger.debug("No valid places data for geographic distribution in %s", city_name, extra=SAMPLED)
             return None
         
-        entities = self.places_data['results']['entities']
-        print(f"[Visualizer] Processing {len(entities)} place entities for geographic distribution")
+        logger.debug("Processing %s place entities for geographic distribution", table.size, extra=SAMPLED)
         
         # Simulate geographic coordinates around the city center
-        random.seed(hash(city_name))  # Consistent results for same city
+        rng = chart_rng(city_name, country_code, 'geographic')  # Consistent results for same city
+        offsets = rng.uniform(-0.01, 0.01, (table.size, 2))
         
         places = []
-        for place in self.places_data['results']['entities']:
-            properties = place.get('properties', {})
-            rating = properties.get('business_rating', 'N/A')
-            tags = place.get('tags', [])
-            # Safely get category - handle empty tags list
-            category = 'Other'
-            if tags and len(tags) > 0:
-                category = tags[0].get('name', 'Other')
-            
+        for name, rating, category, (lat_offset, lng_offset) in zip(
+            table.names, table.rating, table.category_names('Other'), offsets.tolist()
+        ):
             # Simulate coordinates within city bounds
-            lat_offset = random.uniform(-0.01, 0.01)
-            lng_offset = random.uniform(-0.01, 0.01)
-            
             places.append({
-                'name': place.get('name', 'Unknown'),
-                'rating': float(rating) if rating != 'N/A' else 3.0,
+                'name': name,
+                'rating': 3.0 if np.isnan(rating) else float(rating),
                 'category': category,
                 'lat': 40.7128 + lat_offset,  # NYC coordinates as base
                 'lng': -74.0060 + lng_offset
@@ -811,15 +946,15 @@ class QlooVisualizer:
         fig = go.Figure()
         
         # Group by category for different colors
-        categories = list(set([p['category'] for p in places]))
+        categories = list(dict.fromkeys(p['category'] for p in places))
         colors = self.colors[:len(categories)]
         
         # Check if we have enough data
         if not places:
-            print(f"[Visualizer] No valid places data for geographic distribution in {city_name}")
+            logger.debug("No valid places data for geographic distribution in %s", city_name, extra=SAMPLED)
             return None
         
-        print(f"[Visualizer] Created geographic distribution with {len(categories)} categories")
+        logger.debug("Created geographic distribution with %s categories", len(categories), extra=SAMPLED)
         
         for i, category in enumerate(categories):
             if i < len(colors):  # Safety check for colors
@@ -879,46 +1014,26 @@ class QlooVisualizer:
 
     def create_competition_analysis(self, city_name, country_code, limit=50):
         """Create a competition analysis chart showing market saturation"""
-        print(f"[Visualizer] Creating competition analysis for {city_name}, {country_code}")
+        logger.debug("Creating competition analysis for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.places_data or 'results' not in self.places_data or 'entities' not in self.places_data['results']:
-            print(f"[Visualizer] No valid places data for competition analysis in {city_name}")
+        places = self.dataset.places
+        if places is None:
+            logger.debug("No valid places data for competition analysis in %s", city_name, extra=SAMPLED)
             return None
         
-        # Analyze competition by category
-        category_stats = {}
-        for place in self.places_data['results']['entities']:
-            tags = place.get('tags', [])
-            # Safely get category - handle empty tags list
-            category = 'Other'
-            if tags and len(tags) > 0:
-                category = tags[0].get('name', 'Other')
-            properties = place.get('properties', {})
-            rating = properties.get('business_rating', 'N/A')
-            
-            if category not in category_stats:
-                category_stats[category] = {
-                    'count': 0,
-                    'ratings': [],
-                    'avg_rating': 0
-                }
-            
-            category_stats[category]['count'] += 1
-            if rating != 'N/A':
-                try:
-                    category_stats[category]['ratings'].append(float(rating))
-                except (ValueError, TypeError):
-                    pass
-        
-        # Calculate average ratings
-        for category in category_stats:
-            ratings = category_stats[category]['ratings']
-            category_stats[category]['avg_rating'] = sum(ratings) / len(ratings) if ratings else 0
+        # Analyze competition by category (the place's first tag): count and mean
+        # rating per group, ignoring unrated places in the mean
+        codes, group = places.category_index()
+        rated = ~np.isnan(places.rating)
+        counts = np.bincount(group, minlength=len(codes))
+        rated_counts = np.bincount(group[rated], minlength=len(codes))
+        rating_sums = np.bincount(group[rated], weights=places.rating[rated], minlength=len(codes))
+        avg_ratings = np.divide(rating_sums, rated_counts, out=np.zeros(len(codes)), where=rated_counts > 0)
         
         # Create bubble chart
-        categories = list(category_stats.keys())
-        counts = [category_stats[cat]['count'] for cat in categories]
-        avg_ratings = [category_stats[cat]['avg_rating'] for cat in categories]
+        categories = [places.category_vocab.names[code] if code >= 0 else 'Other' for code in codes]
+        counts = counts.tolist()
+        avg_ratings = avg_ratings.tolist()
         
         fig = go.Figure()
         
@@ -967,53 +1082,39 @@ class QlooVisualizer:
 
     def create_seasonal_analysis(self, city_name, country_code, limit=50):
         """Create a seasonal analysis chart showing business patterns"""
-        print(f"[Visualizer] Creating seasonal analysis for {city_name}, {country_code}")
+        logger.debug("Creating seasonal analysis for %s, %s", city_name, country_code, extra=SAMPLED)
         
-        if not self.places_data or 'results' not in self.places_data or 'entities' not in self.places_data['results']:
-            print(f"[Visualizer] No valid places data for seasonal analysis in {city_name}")
+        places = self.dataset.places
+        if places is None:
+            logger.debug("No valid places data for seasonal analysis in %s", city_name, extra=SAMPLED)
             return None
         
         # Simulate seasonal data based on business types
-        seasonal_data = {
-            'Spring': [],
-            'Summer': [],
-            'Fall': [],
-            'Winter': []
-        }
-        
-        for place in self.places_data['results']['entities']:
-            tags = place.get('tags', [])
-            tag_names = [tag.get('name', '').lower() for tag in tags]
-            properties = place.get('properties', {})
-            rating = properties.get('business_rating', 'N/A')
-            
-            # Assign seasonal activity based on business type
-            activity_score = 0
-            if any(word in ' '.join(tag_names) for word in ['restaurant', 'cafe', 'bar']):
-                activity_score = 0.8  # High year-round activity
-            elif any(word in ' '.join(tag_names) for word in ['hotel', 'accommodation']):
-                activity_score = 0.9  # High year-round activity
-            elif any(word in ' '.join(tag_names) for word in ['outdoor', 'park', 'beach']):
-                activity_score = 0.6  # Seasonal variation
-            else:
-                activity_score = 0.7  # Moderate year-round activity
-            
-            # Add some seasonal variation
-            seasonal_data['Spring'].append(activity_score * (0.9 + 0.2 * random.random()))
-            seasonal_data['Summer'].append(activity_score * (1.0 + 0.3 * random.random()))
-            seasonal_data['Fall'].append(activity_score * (0.8 + 0.2 * random.random()))
-            seasonal_data['Winter'].append(activity_score * (0.7 + 0.2 * random.random()))
-        
-        # Calculate averages
-        seasons = list(seasonal_data.keys())
+        # Assign seasonal activity based on business type: food & drink and hotels
+        # are busy year-round, outdoor venues vary, everything else is moderate
+        activity_scores = np.select(
+            [
+                places.has_class(DINING),
+                places.has_class(HOTEL),
+                places.has_class(OUTDOOR),
+            ],
+            [0.8, 0.9, 0.6],
+            default=0.7
+        )
+        
         # Guard against division by zero when there are no places/entities
-        if all(len(values) == 0 for values in seasonal_data.values()):
-            print(f"[Visualizer] No seasonal data points generated for {city_name}; skipping seasonal analysis chart")
+        if not len(activity_scores):
+            logger.debug("No seasonal data points generated for %s; skipping seasonal analysis chart", city_name, extra=SAMPLED)
             return None
-        avg_activity = [
-            (sum(seasonal_data[season]) / len(seasonal_data[season])) if len(seasonal_data[season]) > 0 else 0
-            for season in seasons
-        ]
+        
+        # Add some seasonal variation: each season scales a place's activity by a
+        # random factor in [low, low + spread), then average per season
+        seasons = ['Spring', 'Summer', 'Fall', 'Winter']
+        low = np.array([0.9, 1.0, 0.8, 0.7])
+        spread = np.array([0.2, 0.3, 0.2, 0.2])
+        rng = chart_rng(city_name, country_code, 'seasonal')
+        variation = low + spread * rng.random((len(activity_scores), len(seasons)))
+        avg_activity = (activity_scores[:, None] * variation).mean(axis=0).tolist()
         
         # Create seasonal chart
         fig = go.Figure()
@@ -1120,89 +1221,231 @@ class QlooVisualizer:
         
         return fig
 
-    def generate_all_visualizations(self, city_name, country_code, limit=50):
-        """Generate all visualizations for a city and return as JSON-serializable data"""
-        visualizations = {}
-        
-        # Brand popularity chart
-        brand_pop_chart = self.create_brand_popularity_chart(city_name, country_code, limit)
-        if brand_pop_chart:
-            visualizations['brand_popularity'] = brand_pop_chart.to_json()
-        
-        # Brand categories pie chart
-        brand_cat_chart = self.create_brand_categories_pie(city_name, country_code, limit)
-        if brand_cat_chart:
-            visualizations['brand_categories'] = brand_cat_chart.to_json()
-        
-        # Place ratings distribution
-        place_ratings_chart = self.create_place_ratings_distribution(city_name, country_code, limit)
-        if place_ratings_chart:
-            visualizations['place_ratings'] = place_ratings_chart.to_json()
-        
-        # Place categories chart
-        place_cat_chart = self.create_place_categories_chart(city_name, country_code, limit)
-        if place_cat_chart:
-            visualizations['place_categories'] = place_cat_chart.to_json()
-        
-        # Business density analysis
-        business_density_chart = self.create_business_density_analysis(city_name, country_code, limit)
-        if business_density_chart:
-            visualizations['business_density'] = business_density_chart.to_json()
-        
-        # Business hours analysis
-        business_hours_chart = self.create_business_hours_analysis(city_name, country_code, limit)
-        if business_hours_chart:
-            visualizations['business_hours'] = business_hours_chart.to_json()
-        
-        # Price range analysis
-        price_range_chart = self.create_price_range_analysis(city_name, country_code, limit)
-        if price_range_chart:
-            visualizations['price_range'] = price_range_chart.to_json()
-        
-        # Keyword Word Cloud
-        word_cloud = self.create_keyword_word_cloud(city_name)
-        if word_cloud:
-            visualizations['keyword_word_cloud'] = word_cloud.to_json()
-            
-        # NEW: Brand trend analysis
-        try:
-            brand_trend_chart = self.create_brand_trend_analysis(city_name, country_code, limit)
-            if brand_trend_chart:
-                visualizations['brand_trend_analysis'] = brand_trend_chart.to_json()
-        except Exception as e:
-            print(f"[Visualizer] Error creating brand trend analysis: {e}")
-        
-        # NEW: Geographic distribution
-        try:
-            geo_dist_chart = self.create_geographic_distribution(city_name, country_code, limit)
-            if geo_dist_chart:
-                visualizations['geographic_distribution'] = geo_dist_chart.to_json()
-        except Exception as e:
-            print(f"[Visualizer] Error creating geographic distribution: {e}")
-        
-        # NEW: Competition analysis
-        try:
-            competition_chart = self.create_competition_analysis(city_name, country_code, limit)
-            if competition_chart:
-                visualizations['competition_analysis'] = competition_chart.to_json()
-        except Exception as e:
-            print(f"[Visualizer] Error creating competition analysis: {e}")
-        
-        # NEW: Seasonal analysis
+    def build_chart(self, key, city_name, country_code, limit=50, compact=False):
+        """
+        Build one registered chart and encode it.
+
+        Returns (JSON or None, build seconds, serialize seconds or None when
+        there was nothing to encode). Errors propagate.
+        """
+        method, _ = CHARTS[key]
+        start = time.perf_counter()
+        fig = getattr(self, method)(city_name, country_code, limit)
+        built = time.perf_counter()
+        if not fig:
+            return None, built - start, None
+        data = compact_figure_json(fig) if compact else fig.to_json()
+        return data, built - start, time.perf_counter() - built
+
+    def render_chart(self, key, city_name, country_code, limit=50, compact=False):
+        """Build one registered chart and return its JSON, or None if it has no data or fails"""
         try:
-            seasonal_chart = self.create_seasonal_analysis(city_name, country_code, limit)
-            if seasonal_chart:
-                visualizations['seasonal_analysis'] = seasonal_chart.to_json()
-        except Exception as e:
-            print(f"[Visualizer] Error creating seasonal analysis: {e}")
+            data, build_seconds, serialize_seconds = self.build_chart(key, city_name, country_code, limit, compact)
+        except Exception:
+            logger.exception("❌ Error creating %s", key)
+            self.failed_charts.append(key)
+            return None
+        metrics.observe_chart(key, build_seconds, serialize_seconds)
+        return data
+
+    def generate_all_visualizations(self, city_name, country_code, limit=50, compact=False, parallel=None, charts=None):
+        """
+        Generate all visualizations for a city and return as JSON-serializable data
+
+        charts limits the output to a subset of SELECTABLE keys (see select_charts).
+
+        With compact=True the figures are serialized without layout.template and
+        the shared default template is returned once under 'plotly_template';
+        clients set it back as layout.template before plotting.
+
+        With parallel=True (the default when CHART_WORKERS > 0) the charts are
+        built in a process pool and any chart not finished within CHART_TIMEOUT
+        is left out, so latency follows the slowest chart rather than the sum.
+
+        Serialized charts are cached in figure_cache, so repeat requests for
+        the same data skip plotly and return the stored JSON.
+
+        Charts that raised or timed out are listed in self.failed_charts
+        afterwards (charts with no data to show are not failures), so callers
+        can tell a partial response from a complete one.
+        """
+        selected = select_charts(charts)
+        chart_keys = [key for key in selected if key in CHARTS]
+        
+        # Serve what we can from the figure cache; only the misses are built
+        cache_keys = {key: figure_cache_key(self.dataset, key, city_name, country_code, compact) for key in chart_keys}
+        rendered = {key: figure_cache.get(cache_keys[key]) for key in chart_keys}
+        missing = [key for key in chart_keys if rendered[key] is None]
+        if missing:
+            logger.info("🗂️ Figure cache: %s hit(s), building %s chart(s)", len(chart_keys) - len(missing), len(missing))
+        
+        if parallel is None:
+            parallel = CHART_WORKERS > 0 and len(missing) > 1
+        self.failed_charts = []
+        built = None
+        if parallel and missing:
+            outcome = render_charts_parallel(self.dataset, missing, city_name, country_code, limit, compact)
+            if outcome is not None:
+                built, self.failed_charts = outcome
+        if built is None:
+            built = {key: self.render_chart(key, city_name, country_code, limit, compact) for key in missing}
+        for key, chart in built.items():
+            if chart:
+                figure_cache.set(cache_keys[key], chart, len(chart))
+                rendered[key] = chart
+        visualizations = {key: rendered[key] for key in chart_keys if rendered[key]}
             
         # Top Rated Places (Data, not a chart)
-        top_places = self.get_top_rated_places()
-        if top_places:
-            visualizations['top_rated_places'] = json.dumps(top_places)
+        if 'top_rated_places' in selected:
+            top_places = self.get_top_rated_places()
+            if top_places:
+                visualizations['top_rated_places'] = json.dumps(top_places)
+
+        if compact and visualizations:
+            visualizations['plotly_template'] = default_template_json()
 
         return visualizations
 
+
+# --- Parallel chart generation ---
+_chart_pool = None
+_chart_pool_pid = None
+_chart_pool_lock = threading.Lock()
+
+# Datasets already unpickled in this worker process, keyed by payload digest
+_worker_datasets = OrderedDict()
+_WORKER_DATASETS_MAX = 8
+
+# Where a request's pickled dataset is left for the pool workers to read: tasks carry
+# only its path, so the bytes cross to each worker once instead of with every chart
+_PAYLOAD_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def _get_chart_pool():
+    """Return the chart process pool, creating it on first use in this process"""
+    global _chart_pool, _chart_pool_pid
+    with _chart_pool_lock:
+        if _chart_pool is None or _chart_pool_pid != os.getpid():
+            # Never fork a threaded server process: start workers from a clean forkserver
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            workers = CHART_WORKERS if CHART_WORKERS > 0 else min(len(CHARTS), os.cpu_count() or 1)
+            _chart_pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_warm_chart_worker)
+            _chart_pool_pid = os.getpid()
+        return _chart_pool
+
+
+def close_chart_pool():
+    """Shut down the chart process pool (a new one is created on next use)"""
+    global _chart_pool
+    with _chart_pool_lock:
+        pool, _chart_pool = _chart_pool, None
+    if pool is not None and _chart_pool_pid == os.getpid():
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _warm_chart_worker():
+    """Import the plotting stack when a worker starts rather than inside its first chart"""
+    configure_logging()
+    go.Figure
+    pd.DataFrame
+    default_template_json()
+
+
+def _render_chart_in_worker(digest, payload_path, key, city_name, country_code, limit, compact):
+    """
+    Process-pool entry point: build one chart from a pickled CityDataset.
+
+    The dataset is read from payload_path only when this worker has not
+    already loaded the one with this digest.
+
+    Returns build_chart()'s (JSON, build seconds, serialize seconds) so the
+    parent can record the timings; metrics recorded in the child are never
+    scraped. A failed chart is (None, None, None).
+    """
+    dataset = _worker_datasets.get(digest)
+    if dataset is None:
+        with open(payload_path, 'rb') as f:
+            dataset = pickle.load(f)
+        _worker_datasets[digest] = dataset
+        while len(_worker_datasets) > _WORKER_DATASETS_MAX:
+            _worker_datasets.popitem(last=False)
+    visualizer = QlooVisualizer()
+    visualizer.dataset = dataset
+    try:
+        return visualizer.build_chart(key, city_name, country_code, limit, compact)
+    except Exception:
+        logger.exception("❌ Error creating %s", key)
+        return None, None, None
+
+
+def render_charts_parallel(dataset, keys, city_name, country_code, limit, compact=False, timeout=None):
+    """
+    Build charts concurrently in the process pool.
+
+    The dataset is pickled once per request and written to a file (in
+    /dev/shm where available) that lives for the request; tasks carry only
+    its path and digest. Each worker reads and unpickles it once and reuses
+    it for every chart it picks up. Returns (key -> chart JSON, keys
+    that failed or missed the timeout), with None for the charts left out, or
+    None if the pool is unusable or a worker died during the request, so the
+    caller can fall back to building in-process.
+    """
+    timeout = CHART_TIMEOUT if timeout is None else timeout
+    payload = pickle.dumps(dataset, protocol=pickle.HIGHEST_PROTOCOL)
+    digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    try:
+        fd, payload_path = tempfile.mkstemp(prefix='palatlas-dataset-', suffix='.pickle', dir=_PAYLOAD_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+    except OSError as e:
+        logger.warning("⚠️ Cannot hand the dataset to the chart pool, building charts in-process: %s", e)
+        return None
+
+    try:
+        try:
+            pool = _get_chart_pool()
+            futures = {
+                pool.submit(_render_chart_in_worker, digest, payload_path, key, city_name, country_code, limit, compact): key
+                for key in keys
+            }
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.warning("⚠️ Chart pool unavailable, building charts in-process: %s", e)
+            close_chart_pool()
+            return None
+        done, not_done = wait(futures, timeout=timeout)
+    finally:
+        # Charts that start after this (already timed out) fail to load it and are ignored
+        os.unlink(payload_path)
+
+    results = dict.fromkeys(keys)
+    failed = []
+    for future in done:
+        key = futures[future]
+        try:
+            data, build_seconds, serialize_seconds = future.result()
+        except BrokenProcessPool as e:
+            # Every chart still in the pool fails with it; rebuild the whole request in-process
+            logger.error("❌ Chart worker died while creating %s, building charts in-process: %s", key, e)
+            close_chart_pool()
+            return None
+        except Exception as e:
+            logger.error("❌ Error creating %s: %s", key, e)
+            failed.append(key)
+            continue
+        if build_seconds is None:
+            failed.append(key)  # the worker logged the error
+        else:
+            metrics.observe_chart(key, build_seconds, serialize_seconds)
+        results[key] = data
+    for future in not_done:
+        # A chart that is already running keeps its worker until it finishes
+        future.cancel()
+        logger.warning("⏱️ %s not ready after %ss, leaving it out", futures[future], timeout)
+        failed.append(futures[future])
+    return results, failed
+
 # Example usage and testing
 if __name__ == "__main__":
     visualizer = QlooVisualizer()
@@ -1215,4 +1458,4 @@ if __name__ == "__main__":
     with open('visualization_data.json', 'w') as f:
         json.dump(viz_data, f, indent=2)
     
-    print("Visualizations generated and saved to visualization_data.json") 
\ No newline at end of file
+    print("Visualizations generated and saved to visualization_data.json")
\ No newline at end of file
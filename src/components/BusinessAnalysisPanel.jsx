@@ -125,8 +125,7 @@ const BusinessAnalysisPanel = ({ cityName, countryCode, onAnalysisReady }) => {
         },
         body: JSON.stringify({
           city: cityName,
-          country: countryCode,
-          limit: 30
+          country: countryCode
         }),
       });
 
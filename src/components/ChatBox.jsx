@@ -145,8 +145,7 @@ const ChatBox = ({ cityName, countryCode }) => {
         },
         body: JSON.stringify({
           city: cityName,
-          country: countryCode,
-          limit: 30
+          country: countryCode
         }),
       });
 
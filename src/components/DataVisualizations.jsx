@@ -254,16 +254,14 @@ const DataVisualizations = ({ cityName, countryCode, isCompact = false, onReady
         const controller = new AbortController();
         const timeoutId = setTimeout(() => controller.abort(), 30000);
 
-        const response = await fetch('/api/visualizations', {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({
-            city: cityName,
-            country: countryCode,
-            limit: 20
-          }),
+        // GET so the browser can revalidate a cached copy with If-None-Match
+        const params = new URLSearchParams({
+          city: cityName,
+          country: countryCode,
+          compact: 1,
+          version: 2
+        });
+        const response = await fetch(`/api/visualizations?${params}`, {
           signal: controller.signal
         });
 
@@ -344,7 +342,14 @@ const DataVisualizations = ({ cityName, countryCode, isCompact = false, onReady
     modeBarButtonsToRemove: ['pan2d', 'lasso2d', 'select2d', 'autoScale2d', 'hoverClosestCartesian', 'hoverCompareCartesian'],
   });
 
+  // Version 2 responses nest charts as objects; version 1 sends them as JSON strings
+  const parseField = (value) => (typeof value === 'string' ? JSON.parse(value) : value);
+
+  // Compact responses send the shared plotly template once instead of per chart
+  const plotlyTemplate = visualizations.plotly_template ? parseField(visualizations.plotly_template) : undefined;
+
   const getEnhancedLayout = (layout, hideLegend = false) => ({
+    ...(plotlyTemplate ? { template: plotlyTemplate } : {}),
     ...layout,
     title: '',
     autosize: true,
@@ -412,7 +417,7 @@ const DataVisualizations = ({ cityName, countryCode, isCompact = false, onReady
   const renderCard = (header, subtitle, chartData, hideLegend = false) => {
     if (!chartData) return null;
     try {
-      const plotData = JSON.parse(chartData);
+      const plotData = parseField(chartData);
       return (
         <VisualizationContainer isCompact={isCompact}>
           <Box sx={{ display: 'flex', alignItems: 'center', justifyContent: 'space-between', mb: 1 }}>
@@ -448,7 +453,7 @@ const DataVisualizations = ({ cityName, countryCode, isCompact = false, onReady
     }
   };
 
-  const topRatedPlaces = visualizations.top_rated_places ? JSON.parse(visualizations.top_rated_places) : [];
+  const topRatedPlaces = visualizations.top_rated_places ? parseField(visualizations.top_rated_places) : [];
 
   // Calculate summary statistics
   const totalPlaces = topRatedPlaces.length;
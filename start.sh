@@ -1,2 +1,2 @@
 #!/bin/bash
-cd /app/Backend && python app.py 
\ No newline at end of file
+cd /app/Backend && exec gunicorn -c gunicorn.conf.py app:app 
\ No newline at end of file